@@ -1,7 +1,12 @@
 from django.contrib import admin
-from . models import User, Course, Lead, Enrollment
+from . models import User, Course, Lead, Enrollment, Payment, Job, OutboxEvent, Webhook, WebhookDelivery
 
 admin.site.register(Course)
 admin.site.register(Lead)
 admin.site.register(Enrollment)
+admin.site.register(Payment)
+admin.site.register(Job)
+admin.site.register(OutboxEvent)
+admin.site.register(Webhook)
+admin.site.register(WebhookDelivery)
 admin.site.register(User)
\ No newline at end of file
@@ -0,0 +1,126 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import Lead, LeadDailyStat
+
+STAT_FIELDS = ['day', 'status', 'source', 'course_id', 'created_by_id']
+
+
+def apply_lead_deltas(deltas):
+    """
+    Add ``deltas`` ({Lead.rollup_bucket(): +n/-n}) to the LeadDailyStat rows.
+    One UPDATE per touched bucket, plus an INSERT the first time a bucket is seen.
+    """
+    for bucket, delta in deltas.items():
+        if not delta:
+            continue
+        key = dict(zip(STAT_FIELDS, bucket))
+        if LeadDailyStat.objects.filter(**key).update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                LeadDailyStat.objects.create(**key, count=delta)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            LeadDailyStat.objects.filter(**key).update(count=F('count') + delta)
+
+
+def record_lead_saved(lead, created):
+    new = lead.rollup_bucket()
+    old = None if created else getattr(lead, '_loaded_bucket', None)
+    if created:
+        apply_lead_deltas({new: 1})
+    elif old is not None and old != new:
+        apply_lead_deltas({old: -1, new: 1})
+    lead._loaded_bucket = new
+
+
+def record_lead_deleted(lead):
+    apply_lead_deltas({getattr(lead, '_loaded_bucket', None) or lead.rollup_bucket(): -1})
+
+
+def record_leads_created(leads):
+    apply_lead_deltas(Counter(lead.rollup_bucket() for lead in leads))
+
+
+def lead_bucket_counts(queryset):
+    rows = queryset.values(*Lead.ROLLUP_FIELDS).annotate(n=Count('id')).order_by()
+    return Counter({tuple(row[name] for name in Lead.ROLLUP_FIELDS): row['n'] for row in rows})
+
+
+def record_leads_updated(queryset, changes):
+    """
+    Move the rollup counts for a set-based ``queryset.update(**changes)``.
+    Must be called before the update, with the same queryset.
+    """
+    changed = {
+        f'{name}_id' if name in ('course', 'created_by') else name: getattr(value, 'pk', value)
+        for name, value in changes.items()
+    }
+    if not set(changed) & set(Lead.ROLLUP_FIELDS):
+        return
+    deltas = Counter()
+    for bucket, n in lead_bucket_counts(queryset).items():
+        moved = tuple(changed.get(name, value) for name, value in zip(Lead.ROLLUP_FIELDS, bucket))
+        deltas[bucket] -= n
+        deltas[moved] += n
+    apply_lead_deltas(deltas)
+
+
+def reassign_dimension(field, old_value):
+    """Course / user deletion sets the leads' FK to NULL without save signals; follow it."""
+    stats = list(LeadDailyStat.objects.filter(**{field: old_value}))
+    deltas = Counter()
+    for stat in stats:
+        bucket = tuple(None if name == field else getattr(stat, name) for name in STAT_FIELDS)
+        deltas[bucket] += stat.count
+    LeadDailyStat.objects.filter(pk__in=[stat.pk for stat in stats]).delete()
+    apply_lead_deltas(deltas)
+
+
+def rebuild_lead_rollups():
+    with transaction.atomic():
+        LeadDailyStat.objects.all().delete()
+        LeadDailyStat.objects.bulk_create(
+            LeadDailyStat(**dict(zip(STAT_FIELDS, bucket)), count=n)
+            for bucket, n in lead_bucket_counts(Lead.objects.all()).items()
+        )
+
+
+PERIODS = {
+    'day': F('day'),
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+}
+DIMENSIONS = {
+    'status': 'status',
+    'source': 'source',
+    'course': 'course_id',
+    'created_by': 'created_by_id',
+}
+
+
+def lead_pipeline_report(period='day', group_by=(), start=None, end=None):
+    """Lead counts and conversion rate per period and dimension, read from the rollup only."""
+    queryset = LeadDailyStat.objects.filter(count__gt=0)
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lte=end)
+    fields = [name for name in group_by if name == DIMENSIONS[name]]
+    aliases = {name: F(DIMENSIONS[name]) for name in group_by if name != DIMENSIONS[name]}
+    rows = (
+        queryset.annotate(period=PERIODS[period])
+        .values('period', *fields, **aliases)
+        .annotate(
+            total=Sum('count'),
+            converted=Sum('count', filter=Q(status=Lead.StatusChoices.CONVERTED), default=0),
+        )
+        .order_by('period', *group_by)
+    )
+    for row in rows:
+        row['conversion_rate'] = round(row['converted'] / row['total'], 4) if row['total'] else None
+        yield row
@@ -0,0 +1,138 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import filters, status
+from rest_framework.exceptions import APIException, AuthenticationFailed, Throttled
+from rest_framework.request import Request
+
+from .authentication import aauthenticate
+from .caching import COURSE_LIST_KEY, acached_entry, conditional_response
+from .conditional import ConditionalListMixin, with_validators
+from .fastlist import RowBuilder
+from .fieldsets import SparseFieldsetMixin
+from .filters import EnrollmentFilterBackend, LeadFilterBackend
+from .models import Course, Enrollment, Lead
+from .pagination import KeysetPagination
+from .renderers import ORJSONRenderer
+from .serializers import CourseSerializer, EnrollmentSerializer, LeadSerializer
+from .throttling import RoleRateThrottle
+
+
+class JSONResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(ORJSONRenderer().render(data), **kwargs)
+
+
+class AsyncListView(ConditionalListMixin, View):
+    """
+    Read-only list endpoint served with the async ORM (under ASGI a slow
+    client doesn't hold a worker thread). Mirrors the sync view it shadows:
+    same filter backends, keyset pagination, ETag / Last-Modified and
+    response bytes, built from .values() rows like FastListMixin.
+    """
+    http_method_names = ['get', 'head', 'options']
+    queryset = None
+    serializer_class = None
+    filter_backends = []
+    pagination_class = KeysetPagination
+    roles = None
+    throttle_scope = None
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+            if user is None:
+                return JSONResponse({'detail': 'Authentication credentials were not provided.'},
+                                    status=status.HTTP_403_FORBIDDEN)
+            if self.roles is not None and user.role not in self.roles:
+                return JSONResponse({'detail': 'You do not have permission to perform this action.'},
+                                    status=status.HTTP_403_FORBIDDEN)
+            # DRF's Request only for query_params / build_absolute_uri in the filters and paginator
+            self.request = Request(request)
+            self.request.user = user
+            self.request.accepted_renderer = ORJSONRenderer()
+            # The throttle's cache calls block; keep them off the event loop
+            throttle = RoleRateThrottle()
+            if not await sync_to_async(throttle.allow_request)(self.request, self):
+                raise Throttled(throttle.wait())
+            return await self.list(self.request)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            # Like the sync views, whose first authenticator (session) sends no WWW-Authenticate
+            code = status.HTTP_403_FORBIDDEN if isinstance(exc, AuthenticationFailed) else exc.status_code
+            response = JSONResponse(data, status=code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def get_serializer_class(self):
+        return self.serializer_class
+
+    def get_serializer(self, *args, **kwargs):
+        return self.get_serializer_class()(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    async def list(self, request):
+        etag, last_modified = await self.aget_list_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await self.render_list(request)
+        return with_validators(response, etag, last_modified)
+
+    async def render_list(self, request):
+        builder = RowBuilder.for_serializer(self.get_serializer())
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.pagination_class()
+        ordering = paginator.get_ordering(request, queryset, self).lstrip('-')
+        queryset = builder.values(queryset, ordering)
+
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        if page is not None:
+            return JSONResponse({'next': paginator.get_next_link(), 'results': builder.build(page)})
+        return JSONResponse(builder.build([row async for row in queryset]))
+
+
+class AsyncLeadListView(SparseFieldsetMixin, AsyncListView):
+    # GET /api/async/leads/ - same parameters as /api/leads/, ?fields= included
+    queryset = Lead.objects.exclude(status=Lead.StatusChoices.CONVERTED)
+    serializer_class = LeadSerializer
+    throttle_scope = 'leads'
+    filter_backends = [LeadFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['created_at', 'add_date', 'last_call', 'next_call', 'student_name', 'status']
+    ordering = ['-created_at']
+
+
+class AsyncEnrollmentListView(AsyncListView):
+    # GET /api/async/enrollments/ - same parameters as /api/enrollments/
+    queryset = Enrollment.objects.for_display()
+    serializer_class = EnrollmentSerializer
+    throttle_scope = 'enrollments'
+    filter_backends = [EnrollmentFilterBackend]
+
+
+class AsyncCourseListView(AsyncListView):
+    # GET /api/async/courses/ - shares the cached entry (and ETag) of /api/courses/
+    queryset = Course.objects.all()
+    serializer_class = CourseSerializer
+    roles = ['superadmin', 'admin']
+
+    async def list(self, request):
+        builder = RowBuilder.for_serializer(self.serializer_class())
+
+        async def build():
+            return builder.build([row async for row in builder.values(self.get_queryset())])
+
+        entry = await acached_entry(COURSE_LIST_KEY, build, settings.COURSE_CACHE_TTL)
+        return conditional_response(request, entry, response_class=JSONResponse)
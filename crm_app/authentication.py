@@ -0,0 +1,158 @@
+import datetime
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+from .db_router import reading_from_primary
+from .models import User
+
+ALGORITHM = 'HS256'
+
+
+def user_state_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_user_state(user_id):
+    """
+    (is_active, role, token_version) for the user, cached for
+    JWT_REVOCATION_CACHE_TTL seconds. None if the user no longer exists.
+    Read from the primary, so a lagging replica can't cache a revoked token
+    as valid.
+    """
+    key = user_state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        with reading_from_primary():
+            state = User.objects.filter(pk=user_id).values('is_active', 'role', 'token_version').first() or {}
+        cache.set(key, state, settings.JWT_REVOCATION_CACHE_TTL)
+    return state or None
+
+
+async def aget_user_state(user_id):
+    key = user_state_key(user_id)
+    state = await cache.aget(key)
+    if state is None:
+        with reading_from_primary():
+            state = await User.objects.filter(pk=user_id).values('is_active', 'role', 'token_version').afirst() or {}
+        await cache.aset(key, state, settings.JWT_REVOCATION_CACHE_TTL)
+    return state or None
+
+
+def invalidate_user_state(user_id):
+    key = user_state_key(user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def issue_token(user):
+    now = timezone.now()
+    expires = now + datetime.timedelta(seconds=settings.JWT_ACCESS_TTL)
+    claims = {
+        'sub': str(user.pk),
+        'username': user.username,
+        'role': user.role,
+        'ver': user.token_version,
+        'iat': now,
+        'exp': expires,
+    }
+    return jwt.encode(claims, settings.JWT_SECRET_KEY, algorithm=ALGORITHM), expires
+
+
+def decode_token(token):
+    """Verify the signature and expiry; returns the TokenUser and its claims."""
+    try:
+        claims = jwt.decode(
+            token, settings.JWT_SECRET_KEY, algorithms=[ALGORITHM],
+            options={'require': ['sub', 'exp', 'role', 'ver']},
+        )
+        return TokenUser(claims), claims
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token has expired.')
+    except (jwt.InvalidTokenError, KeyError, ValueError):
+        raise exceptions.AuthenticationFailed('Invalid token.')
+
+
+def check_not_revoked(user, claims, state):
+    if not state or not state['is_active'] or state['role'] != user.role or state['token_version'] != claims['ver']:
+        raise exceptions.AuthenticationFailed('Token has been revoked.')
+
+
+class TokenUser:
+    """
+    request.user for token-authenticated requests, built from the token
+    claims. Attributes beyond id / username / role load the User row once.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims):
+        self.pk = self.id = int(claims['sub'])
+        self.username = claims['username']
+        self.role = claims['role']
+
+    def __str__(self):
+        return self.username
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if '_user' not in self.__dict__:
+            self._user = User.objects.get(pk=self.pk)
+        return getattr(self._user, name)
+
+    def is_superadmin(self):
+        return self.role == User.Roles.SUPERADMIN
+
+    def is_admin(self):
+        return self.role == User.Roles.ADMIN
+
+    def is_sales_rep(self):
+        return self.role == User.Roles.SALES_REP
+
+
+class JWTAuthentication(authentication.BaseAuthentication):
+    """
+    ``Authorization: Bearer <token>``. The signature and expiry are checked
+    locally; revocation (deactivated user, changed role or password, logout)
+    is a cache lookup, so the hot path needs no database query.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        user, claims = decode_token(header[1])
+        check_not_revoked(user, claims, get_user_state(user.pk))
+        return user, claims
+
+    def authenticate_header(self, request):
+        return f'{self.keyword} realm="api"'
+
+
+async def aauthenticate(request):
+    """
+    Authenticates a plain Django request for the async views: bearer
+    tokens, DRF tokens, then the session. Returns None when anonymous.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if len(header) == 2 and header[0].lower() == JWTAuthentication.keyword.lower():
+        user, claims = decode_token(header[1])
+        check_not_revoked(user, claims, await aget_user_state(user.pk))
+        return user
+    if len(header) == 2 and header[0].lower() == 'token':
+        token = await Token.objects.select_related('user').filter(key=header[1]).afirst()
+        if token is None or not token.user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return token.user
+    user = await request.auser()
+    return user if user.is_authenticated else None
@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .db_router import reading_from_primary
+
+COURSE_LIST_KEY = 'courses:list'
+
+
+def course_detail_key(pk):
+    return f'courses:{pk}'
+
+
+def make_etag(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return f'"{hashlib.md5(payload).hexdigest()}"'
+
+
+def build_entry(data):
+    return {'data': data, 'etag': make_etag(data), 'last_modified': int(timezone.now().timestamp())}
+
+
+def cached_entry(key, build, timeout):
+    """
+    Return the cached {'data', 'etag', 'last_modified'} entry for ``key``,
+    calling ``build()`` (and hitting the primary database) only on a miss.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        with reading_from_primary():
+            entry = build_entry(build())
+        cache.set(key, entry, timeout)
+    return entry
+
+
+async def acached_entry(key, build, timeout):
+    """cached_entry() for async views; ``build`` is a coroutine function."""
+    entry = await cache.aget(key)
+    if entry is None:
+        with reading_from_primary():
+            entry = build_entry(await build())
+        await cache.aset(key, entry, timeout)
+    return entry
+
+
+def conditional_response(request, entry, response_class=Response):
+    """Answer 304 when the client's validators match, otherwise send the cached data."""
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    if response is None:
+        response = response_class(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
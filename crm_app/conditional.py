@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .caching import make_etag
+
+# Headers that make a write conditional on the version the client last saw
+PRECONDITION_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+
+def get_path(obj, path):
+    # 'lead__updated_at' -> obj.lead.updated_at, None if lead is None
+    for name in path.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    return obj
+
+
+def last_modified_of(stamps):
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return int(max(stamps).timestamp()) if stamps else None
+
+
+def with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalDetailMixin:
+    """
+    ETag and Last-Modified on a detail view, taken from the object's
+    ``last_modified_fields`` (and the ``?fields=`` selection, if the view
+    has one). A GET whose If-None-Match matches gets a 304 without
+    serializing. PUT/PATCH/DELETE lock the row for the whole write,
+    so it works from the current version (previous status, rollup bucket),
+    and a stale If-Match or If-Unmodified-Since gets a 412.
+    """
+    last_modified_fields = ['updated_at']
+
+    def get_validators(self, instance):
+        stamps = [get_path(instance, field) for field in self.last_modified_fields]
+        # A ?fields= response is a different representation from the full one
+        fields = self.get_requested_fields() if hasattr(self, 'get_requested_fields') else None
+        etag = make_etag([instance._meta.label, instance.pk, self.request.accepted_renderer.format, fields, *stamps])
+        return etag, last_modified_of(stamps)
+
+    def has_preconditions(self):
+        return any(header in self.request.META for header in PRECONDITION_HEADERS)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            # Outer joins (select_related) can't be locked; the row itself is enough
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def get_object(self):
+        # The precondition check and the update share one (locked) fetch
+        if getattr(self, '_object', None) is None:
+            self._object = super().get_object()
+        return self._object
+
+    def check_preconditions(self, request):
+        if not self.has_preconditions():
+            return None
+        etag, last_modified = self.get_validators(self.get_object())
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_validators(instance)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return with_validators(response, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = self.check_preconditions(request)
+            if response is not None:
+                return response
+            response = super().update(request, *args, **kwargs)
+        return with_validators(response, *self.get_validators(self.get_object()))
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = self.check_preconditions(request)
+            if response is not None:
+                return response
+            return super().destroy(request, *args, **kwargs)
+
+
+class ConditionalListMixin:
+    """
+    ETag and Last-Modified on a list view from MAX(``last_modified_fields``)
+    and COUNT(*) over the filtered queryset, one aggregate query. A matching
+    If-None-Match gets a 304 before any row is loaded. The count catches
+    deletions, which don't move Last-Modified, so clients should prefer
+    If-None-Match.
+    """
+    last_modified_fields = ['updated_at']
+
+    def get_validator_query(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {f'last_{i}': Max(field) for i, field in enumerate(self.last_modified_fields)}
+        return queryset, aggregates
+
+    def make_list_validators(self, request, queryset, stats):
+        stamps = [stats[f'last_{i}'] for i in range(len(self.last_modified_fields))]
+        etag = make_etag([
+            queryset.model._meta.label, request.accepted_renderer.format,
+            request.query_params.urlencode(), stats['count'], *stamps,
+        ])
+        return etag, last_modified_of(stamps)
+
+    def get_list_validators(self, request):
+        queryset, aggregates = self.get_validator_query()
+        return self.make_list_validators(request, queryset, queryset.aggregate(count=Count('pk'), **aggregates))
+
+    async def aget_list_validators(self, request):
+        queryset, aggregates = self.get_validator_query()
+        stats = await queryset.aaggregate(count=Count('pk'), **aggregates)
+        return self.make_list_validators(request, queryset, stats)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return with_validators(response, etag, last_modified)
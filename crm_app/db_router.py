@@ -0,0 +1,112 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set by ReplicaRoutingMiddleware for the duration of a safe request
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+PRIMARY_COOKIE = 'crm_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@contextmanager
+def reading_from_primary():
+    """
+    Reads inside the block go to the primary. For reads whose result outlives
+    the request (cache fills, revocation checks): a lagging replica would
+    otherwise keep stale data around for the whole cache TTL.
+    """
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random settings.REPLICA_DATABASES alias while
+    ``read_from_replica`` is set, and everything else to the primary.
+    Reads inside a transaction on the primary stay on the primary so they
+    see its uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not (settings.REPLICA_DATABASES and read_from_replica.get()):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets GET/HEAD/OPTIONS requests read from the replicas. A request that
+    writes pins the client to the primary for REPLICA_STICKY_SECONDS (via a
+    cookie), so it reads its own writes despite replication lag.
+
+    Sync and async capable, so ASGI requests to the async views stay on the
+    event loop; sync views run in a thread that inherits the context var.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def use_replica(self, request):
+        return request.method in SAFE_METHODS and not self.is_pinned(request)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_from_replica.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_writes(request, response)
+
+    async def __acall__(self, request):
+        token = read_from_replica.set(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_writes(request, response)
+
+    def pin_writes(self, request, response):
+        if settings.REPLICA_DATABASES and request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
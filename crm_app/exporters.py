@@ -0,0 +1,83 @@
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (CSV header, values_list() lookup)
+LEAD_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('add_date', 'add_date'),
+    ('parents_name', 'parents_name'),
+    ('student_name', 'student_name'),
+    ('email', 'email'),
+    ('phone_number', 'phone_number'),
+    ('whatsapp_number', 'whatsapp_number'),
+    ('age', 'age'),
+    ('grade', 'grade'),
+    ('source', 'source'),
+    ('course', 'course_id'),
+    ('course_name', 'course__course_name'),
+    ('class_type', 'class_type'),
+    ('shift', 'shift'),
+    ('previous_coding_experience', 'previous_coding_experience'),
+    ('last_call', 'last_call'),
+    ('next_call', 'next_call'),
+    ('value', 'value'),
+    ('adset_name', 'adset_name'),
+    ('payment_type', 'payment_type'),
+    ('device', 'device'),
+    ('workshop_batch', 'workshop_batch'),
+    ('remarks', 'remarks'),
+    ('address_line_1', 'address_line_1'),
+    ('address_line_2', 'address_line_2'),
+    ('city', 'city'),
+    ('county', 'county'),
+    ('post_code', 'post_code'),
+    ('created_by', 'created_by__username'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+ENROLLMENT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('lead', 'lead_id'),
+    ('student_name', 'lead__student_name'),
+    ('parents_name', 'lead__parents_name'),
+    ('email', 'lead__email'),
+    ('phone_number', 'lead__phone_number'),
+    ('course', 'course_id'),
+    ('course_name', 'course__course_name'),
+    ('total_payment', 'total_payment'),
+    ('amount_paid', 'amount_paid'),
+    ('balance', 'balance'),
+    ('last_pay_date', 'last_pay_date'),
+    ('payment_completed', 'payment_completed'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in columns])
+    # .iterator() uses a server-side cursor on PostgreSQL, so rows are
+    # fetched chunk_size at a time instead of all at once.
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_export_response(queryset, columns, name):
+    filename = f"{name}-{timezone.localdate().isoformat()}.csv"
+    response = StreamingHttpResponse(iter_csv(queryset, columns), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
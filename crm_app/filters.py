@@ -0,0 +1,99 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from .models import Lead
+
+
+class LeadFilter:
+    """
+    Translates query parameters into SQL filters on Lead.
+
+    Choice and id parameters accept several values, either repeated
+    (?status=New&status=Open) or comma-separated (?status=New,Open).
+    Date ranges are inclusive: ?next_call_after=2025-01-01&next_call_before=2025-01-31.
+    """
+    choice_fields = {
+        'status': Lead.StatusChoices,
+        'source': Lead.SourceChoices,
+        'shift': Lead.ShiftChoices,
+        'class_type': Lead.ClassTypeChoices,
+        'payment_type': Lead.PaymentTypeChoices,
+        'device': Lead.DeviceChoices,
+        'previous_coding_experience': Lead.CodingExperienceChoices,
+    }
+    id_fields = ['course', 'created_by']
+    date_fields = ['add_date', 'last_call', 'next_call']
+
+    def __init__(self, params):
+        self.params = params
+        self.errors = {}
+
+    def get_values(self, name):
+        if hasattr(self.params, 'getlist'):
+            raw = self.params.getlist(name)
+        else:
+            raw = self.params.get(name, [])
+            raw = raw if isinstance(raw, (list, tuple)) else [raw]
+        return [value.strip() for item in raw for value in str(item).split(',') if value.strip()]
+
+    def parse_date(self, name):
+        value = self.params.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            self.errors[name] = 'Enter a date in YYYY-MM-DD format.'
+
+    def filter_queryset(self, queryset):
+        for name, choices in self.choice_fields.items():
+            values = self.get_values(name)
+            if not values:
+                continue
+            invalid = [value for value in values if value not in choices.values]
+            if invalid:
+                self.errors[name] = f"Invalid choice(s): {', '.join(invalid)}."
+                continue
+            queryset = queryset.filter(**{f'{name}__in': values})
+
+        for name in self.id_fields:
+            values = self.get_values(name)
+            if not values:
+                continue
+            if not all(value.isdigit() for value in values):
+                self.errors[name] = 'Expected a list of ids.'
+                continue
+            queryset = queryset.filter(**{f'{name}__in': values})
+
+        for name in self.date_fields:
+            after = self.parse_date(f'{name}_after')
+            before = self.parse_date(f'{name}_before')
+            if after:
+                queryset = queryset.filter(**{f'{name}__gte': after})
+            if before:
+                queryset = queryset.filter(**{f'{name}__lte': before})
+
+        if self.errors:
+            raise ValidationError(self.errors)
+        return queryset
+
+
+class LeadFilterBackend(filters.BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return LeadFilter(request.query_params).filter_queryset(queryset)
+
+
+class EnrollmentFilterBackend(filters.BaseFilterBackend):
+    # ?outstanding=true / ?overdue=true narrow to enrollments that still owe money
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if params.get('overdue') == 'true':
+            before = timezone.localdate() - datetime.timedelta(days=settings.PAYMENT_OVERDUE_DAYS)
+            return queryset.overdue(before)
+        if params.get('outstanding') == 'true':
+            return queryset.outstanding()
+        return queryset
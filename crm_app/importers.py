@@ -0,0 +1,124 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from . import outbox
+from .analytics import record_leads_created
+from .models import Course, Lead
+from .serializers import LeadImportSerializer
+from .services import convert_leads
+
+FORMATS = ['csv', 'jsonl']
+MAX_REPORTED_ERRORS = 1000
+
+
+def guess_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+class LeadImporter:
+    """
+    Streams leads from CSV or JSONL and inserts them in batches.
+
+    ``lines`` is any iterable of byte lines (an open file, an UploadedFile),
+    so only one batch is held in memory at a time. Each row is validated with
+    LeadImportSerializer; valid rows of a batch are written with one
+    bulk_create, plus one bulk_create for the enrollments of Converted rows.
+    A row repeating an earlier row's student and phone number is reported as
+    a duplicate instead of imported (only those keys are kept across batches).
+    """
+
+    def __init__(self, user=None, batch_size=1000):
+        self.user_id = user.pk if user else None
+        self.batch_size = batch_size
+        self.courses = {course.pk: course for course in Course.objects.all()}
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        # (student name, phone digits) -> line of its first row
+        self.seen = {}
+
+    def iter_rows(self, lines, fmt):
+        text = codecs.iterdecode(lines, 'utf-8-sig')
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                # Blank cells mean "not provided" so model defaults apply
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+        else:
+            for line_num, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield line_num, {'__error__': f'Invalid JSON: {exc}'}
+                    continue
+                if not isinstance(row, dict):
+                    row = {'__error__': 'Expected a JSON object.'}
+                yield line_num, row
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def duplicate_key(self, data):
+        phone = ''.join(char for char in data.get('phone_number', '') if char.isdigit())
+        return data.get('student_name', '').strip().casefold(), phone
+
+    def validate(self, batch):
+        leads = []
+        context = {'courses': self.courses}
+        for line, row in batch:
+            if '__error__' in row:
+                self.add_error(line, {'non_field_errors': [row['__error__']]})
+                continue
+            serializer = LeadImportSerializer(data=row, context=context)
+            if not serializer.is_valid():
+                self.add_error(line, serializer.errors)
+                continue
+            first = self.seen.setdefault(self.duplicate_key(serializer.validated_data), line)
+            if first != line:
+                self.add_error(line, {'non_field_errors': [f'Duplicate of line {first}.']})
+                continue
+            leads.append(Lead(**serializer.validated_data, created_by_id=self.user_id))
+        return leads
+
+    def save(self, leads):
+        with transaction.atomic():
+            leads = Lead.objects.bulk_create(leads)
+            record_leads_created(leads)
+            outbox.record_leads_created(leads)
+            convert_leads([lead for lead in leads if lead.status == Lead.StatusChoices.CONVERTED])
+        self.created += len(leads)
+
+    def run(self, lines, fmt):
+        rows = self.iter_rows(lines, fmt)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.rows += len(batch)
+            leads = self.validate(batch)
+            if leads:
+                self.save(leads)
+        return self.report()
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
@@ -0,0 +1,118 @@
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> function(job) returning a JSON-serializable result; filled by crm_app/tasks.py
+TASKS = {}
+
+
+class JobFailed(Exception):
+    """
+    Raised by a task for a failure that retrying can't fix (invalid input).
+    The job fails at once, with ``result`` (e.g. validation errors) stored on it.
+    """
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def task(name):
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, user=None, max_attempts=None):
+    """
+    Queue ``name`` to run in a worker. The job becomes visible to workers
+    when the surrounding transaction commits. Tasks that aren't safe to
+    repeat (imports) should pass max_attempts=1.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Unknown task: {name}')
+    return Job.objects.create(
+        task=name, payload=payload or {}, created_by_id=user.pk if user else None,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim_next():
+    """Mark the oldest due job running and return it; SKIP LOCKED lets workers claim in parallel."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.filter(status=Job.StatusChoices.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.StatusChoices.RUNNING
+        job.attempts += 1
+        job.started_at = now
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+    return job
+
+
+def retry_or_fail(job, error):
+    job.error = error
+    if job.attempts < job.max_attempts:
+        # 1x, 2x, 4x ... JOB_RETRY_DELAY
+        delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.status = Job.StatusChoices.QUEUED
+        job.run_after = timezone.now() + datetime.timedelta(seconds=delay)
+    else:
+        job.status = Job.StatusChoices.FAILED
+        job.finished_at = timezone.now()
+
+
+def run_job(job):
+    try:
+        result = TASKS[job.task](job)
+    except JobFailed as exc:
+        logger.warning('Job %s (%s) failed: %s', job.pk, job.task, exc)
+        job.status = Job.StatusChoices.FAILED
+        job.result = exc.result
+        job.error = str(exc)
+        job.finished_at = timezone.now()
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+        retry_or_fail(job, traceback.format_exc())
+    else:
+        job.status = Job.StatusChoices.SUCCEEDED
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'run_after', 'finished_at'])
+    return job
+
+
+def requeue_stale():
+    """Retry (or fail) jobs left running past JOB_TIMEOUT by a worker that died."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.JOB_TIMEOUT)
+    with transaction.atomic():
+        stale = Job.objects.filter(status=Job.StatusChoices.RUNNING, started_at__lt=cutoff).select_for_update(
+            skip_locked=True,
+        )
+        for job in stale:
+            retry_or_fail(job, f'Worker stopped responding (no result after {settings.JOB_TIMEOUT}s).')
+            job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+
+
+def run_pending():
+    """Run due jobs in this process until none are left; the worker's --once mode."""
+    count = 0
+    while (job := claim_next()) is not None:
+        run_job(job)
+        count += 1
+    return count
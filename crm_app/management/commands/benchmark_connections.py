@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from crm_app.models import Lead, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures requests per second on GET /api/leads/<id>/ with a new database connection '
+        'per request, with persistent connections and (if configured) with the psycopg pool. '
+        'Read-only: it fetches an existing lead as an unsaved admin user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode (default 500).')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent client threads (default 4).')
+        parser.add_argument('--lead', type=int, help='Lead to fetch (default: the newest lead).')
+
+    def get_modes(self):
+        settings_dict = connection.settings_dict
+        options = {key: value for key, value in settings_dict['OPTIONS'].items() if key != 'pool'}
+        modes = [
+            ('connection per request', {'CONN_MAX_AGE': 0, 'OPTIONS': options}),
+            ('persistent connections', {'CONN_MAX_AGE': 600, 'OPTIONS': options}),
+        ]
+        if 'pool' in settings_dict['OPTIONS']:
+            modes.append(('psycopg pool', {'CONN_MAX_AGE': 0, 'OPTIONS': settings_dict['OPTIONS']}))
+        return modes
+
+    def run_requests(self, url, user, count):
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(count):
+            # The test client disconnects close_old_connections() from the request
+            # signals; call it around each request as a real server would, so
+            # CONN_MAX_AGE=0 really reconnects every time.
+            close_old_connections()
+            if client.get(url, HTTP_ACCEPT='application/json').status_code != 200:
+                raise CommandError(f'GET {url} failed.')
+            close_old_connections()
+        connections.close_all()
+
+    def measure(self, url, user, total, threads):
+        per_thread = total // threads
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: self.run_requests(url, user, per_thread), range(threads)))
+        return per_thread * threads / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        # Safe requests may be routed to a replica, so every database gets the mode
+        original = {
+            alias: {key: connections[alias].settings_dict[key] for key in ['CONN_MAX_AGE', 'OPTIONS']}
+            for alias in connections
+        }
+        # The request threads use their own connections, so rows created in a
+        # rolled-back transaction would be invisible to them; write nothing instead.
+        leads = Lead.objects.order_by('-pk')
+        lead = leads.filter(pk=options['lead']).first() if options['lead'] else leads.first()
+        if lead is None:
+            raise CommandError('No lead to fetch; create one or pass --lead.')
+        # force_authenticate() needs no saved user, and no request path reads it back
+        user = User(username='benchmark-connections', role=User.Roles.ADMIN)
+        url = f'/api/leads/{lead.pk}/'
+        try:
+            results = []
+            # The test client sends Host: testserver; no rates means no throttling
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+            ):
+                for label, overrides in self.get_modes():
+                    connections.close_all()
+                    # Shared by every thread's connection to each database
+                    for alias in connections:
+                        connections[alias].settings_dict.update(overrides)
+                    results.append((label, self.measure(url, user, options['requests'], options['threads'])))
+        finally:
+            connections.close_all()
+            for alias, values in original.items():
+                connections[alias].settings_dict.update(values)
+
+        baseline = results[0][1]
+        self.stdout.write(f"GET {url}, {options['requests']} requests, {options['threads']} threads")
+        for label, rps in results:
+            self.stdout.write(f'  {label:<24} {rps:8.1f} req/s  ({rps / baseline:.1f}x)')
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from crm_app.fastlist import RowBuilder
+from crm_app.models import Course, Enrollment, Lead
+from crm_app.renderers import ORJSONRenderer
+from crm_app.serializers import EnrollmentSerializer, LeadSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the serializer + JSONRenderer path with the .values() + ORJSONRenderer path '
+        'for the lead and enrollment lists. Test rows are created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of rows per list (default 10000).')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs (default 3).')
+
+    def create_rows(self, count):
+        course = Course.objects.create(course_name='Benchmark')
+        leads = Lead.objects.bulk_create(
+            Lead(
+                parents_name=f'Parent {i}', student_name=f'Student {i}', email=f'parent{i}@example.com',
+                phone_number='9800000000', whatsapp_number='9800000000', age='10', grade='5',
+                source=Lead.SourceChoices.FACEBOOK, class_type=Lead.ClassTypeChoices.ONLINE,
+                course=course, remarks='Called, asked to follow up next week.',
+            )
+            for i in range(count)
+        )
+        # Some enrollments without a lead, and some without a course (deleting a course sets it NULL)
+        Enrollment.objects.bulk_create(
+            Enrollment(
+                lead=None if i % 5 == 0 else lead, course=None if i % 3 == 0 else course,
+                total_payment=1000, balance=1000,
+            )
+            for i, lead in enumerate(leads)
+        )
+        # Fresh statistics, or the planner joins the new rows with nested loops
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE crm_app_course, crm_app_lead, crm_app_enrollment')
+
+    def serializer_path(self, serializer_class, queryset):
+        return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+    def values_path(self, serializer_class, queryset):
+        builder = RowBuilder.for_serializer(serializer_class())
+        return ORJSONRenderer().render(builder.build(builder.values(queryset)))
+
+    def best_of(self, func, serializer_class, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = func(serializer_class, queryset.all())
+            timings.append(time.perf_counter() - start)
+        return min(timings), body
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        results = []
+        try:
+            with transaction.atomic():
+                self.create_rows(rows)
+                for name, serializer_class, queryset in [
+                    ('leads', LeadSerializer, Lead.objects.order_by('-id')[:rows]),
+                    ('enrollments', EnrollmentSerializer, Enrollment.objects.for_display().order_by('-id')[:rows]),
+                ]:
+                    slow, slow_body = self.best_of(self.serializer_path, serializer_class, queryset, options['repeat'])
+                    fast, fast_body = self.best_of(self.values_path, serializer_class, queryset, options['repeat'])
+                    results.append((name, slow, slow_body, fast, fast_body))
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, slow, slow_body, fast, fast_body in results:
+            if slow_body != fast_body:
+                raise CommandError(f'The two paths produced different output for {name}.')
+            self.stdout.write(f'{rows} {name}, {len(fast_body)} bytes, best of {options["repeat"]}')
+            self.stdout.write(f'  serializer + JSONRenderer:   {slow * 1000:8.1f} ms')
+            self.stdout.write(f'  .values() + ORJSONRenderer:  {fast * 1000:8.1f} ms')
+            self.stdout.write(self.style.SUCCESS(f'  speedup: {slow / fast:.1f}x'))
@@ -0,0 +1,14 @@
+from crm_app.management.worker import WorkerCommand
+from crm_app.webhooks import dispatch
+
+
+class Command(WorkerCommand):
+    help = 'Delivers outbox events to the registered webhooks, in batches, with retries.'
+    once_help = 'Deliver what is due, then exit.'
+    poll_seconds_setting = 'WEBHOOK_POLL_SECONDS'
+
+    def work(self):
+        events, delivered = dispatch()
+        if events or delivered:
+            self.stdout.write(f'{events} events queued, {delivered} delivered.')
+        return bool(events or delivered)
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from crm_app.models import Lead, User
+from crm_app.pagination import keyset_ordering
+from crm_app.search import search_leads
+from crm_app.services import call_queue
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot lead pipeline queries and checks that they use the expected indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (executes the queries).')
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help='Disable sequential scans for the check. Useful on small databases where '
+                 'the planner prefers a seq scan even though the index is usable.',
+        )
+
+    def get_queries(self):
+        user = User.objects.order_by('id').first()
+        user_id = user.id if user else 0
+        ordering = keyset_ordering('created_at', descending=True)
+        return [
+            (
+                'open lead list',
+                Lead.objects.exclude(status=Lead.StatusChoices.CONVERTED).order_by(*ordering)[:50],
+                'lead_open_created_idx',
+            ),
+            (
+                'lead list by status',
+                Lead.objects.filter(status=Lead.StatusChoices.FOLLOWUP).order_by(*ordering)[:50],
+                'lead_status_created_idx',
+            ),
+            (
+                'lead list by source',
+                Lead.objects.filter(source=Lead.SourceChoices.FACEBOOK).order_by(*ordering)[:50],
+                'lead_source_created_idx',
+            ),
+            (
+                'rep call queue',
+                call_queue(user_id, timezone.localdate())[:50],
+                'lead_owner_next_call_idx',
+            ),
+            (
+                'full-text search',
+                search_leads(Lead.objects.all(), 'ram sharma')[:20],
+                'lead_search_vector_idx',
+            ),
+            (
+                'phone prefix search',
+                search_leads(Lead.objects.all(), '98410')[:20],
+                'lead_phone_digits_idx',
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_lead_queries requires PostgreSQL.')
+
+        failures = []
+        with transaction.atomic():
+            if options['no_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, queryset, index_name in self.get_queries():
+                plan = queryset.explain(analyze=options['analyze'])
+                used = index_name in plan
+                if not used:
+                    failures.append(label)
+                style = self.style.SUCCESS if used else self.style.ERROR
+                self.stdout.write(style(f"{'OK  ' if used else 'FAIL'} {label}: expected {index_name}"))
+                if options['verbosity'] > 1 or not used:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"Queries not using their index: {', '.join(failures)}")
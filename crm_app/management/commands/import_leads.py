@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.importers import FORMATS, LeadImporter, guess_format
+from crm_app.models import User
+
+
+class Command(BaseCommand):
+    help = 'Imports leads from a CSV or JSONL file in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--user', help='Username recorded as created_by.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt not in FORMATS:
+            raise CommandError('Cannot tell the file format, pass --format.')
+
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        importer = LeadImporter(user=user, batch_size=options['batch_size'])
+        with open(options['path'], 'rb') as lines:
+            report = importer.run(lines, fmt)
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows read, {report['created']} leads created, {report['failed']} failed."
+        ))
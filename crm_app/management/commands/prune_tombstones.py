@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from crm_app.models import Tombstone
+from crm_app.sync import tombstone_horizon
+
+
+class Command(BaseCommand):
+    help = 'Deletes sync tombstones older than SYNC_TOMBSTONE_DAYS.'
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tombstones deleted.'))
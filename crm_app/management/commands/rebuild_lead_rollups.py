@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from crm_app.analytics import rebuild_lead_rollups
+from crm_app.models import LeadDailyStat
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the LeadDailyStat analytics rollup from the lead table.'
+
+    def handle(self, *args, **options):
+        rebuild_lead_rollups()
+        self.stdout.write(self.style.SUCCESS(f'{LeadDailyStat.objects.count()} rollup buckets written.'))
@@ -0,0 +1,27 @@
+import time
+
+from crm_app.jobs import claim_next, requeue_stale, run_job, run_pending
+from crm_app.management.worker import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = 'Runs queued background jobs. Start as many workers as needed; they claim jobs with SKIP LOCKED.'
+    once_help = 'Run the jobs that are due, then exit.'
+    poll_seconds_setting = 'JOB_POLL_SECONDS'
+    last_stale_check = 0
+
+    def run_once(self):
+        requeue_stale()
+        self.stdout.write(f'{run_pending()} jobs run.')
+
+    def work(self):
+        if time.monotonic() - self.last_stale_check > 60:
+            requeue_stale()
+            self.last_stale_check = time.monotonic()
+        job = claim_next()
+        if job is None:
+            return False
+        self.stdout.write(f'Running {job}')
+        run_job(job)
+        self.stdout.write(f'Finished {job}')
+        return True
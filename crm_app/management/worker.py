@@ -0,0 +1,45 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Base for long-running worker commands: polls ``work()`` until SIGTERM or
+    SIGINT, sleeping ``settings.<poll_seconds_setting>`` whenever a pass
+    finds nothing to do. ``--once`` calls ``run_once()`` and exits.
+    """
+    poll_seconds_setting = None
+    once_help = 'Process what is due, then exit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help=self.once_help)
+
+    def work(self):
+        """Process one job or batch; return whether there was anything to do."""
+        raise NotImplementedError
+
+    def run_once(self):
+        while self.work():
+            pass
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.run_once()
+            return
+
+        self.stopping = False
+        # Finish the current job or batch before exiting
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopping:
+            # Like a request: drop connections past CONN_MAX_AGE or broken ones
+            close_old_connections()
+            if not self.work():
+                time.sleep(getattr(settings, self.poll_seconds_setting))
+
+    def stop(self, signum, frame):
+        self.stopping = True
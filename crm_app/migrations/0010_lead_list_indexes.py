@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the lead and enrollment tables against writes.
+    atomic = False
+
+    dependencies = [
+        ('crm_app', '0009_alter_user_role'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='enrollment',
+            index=models.Index(models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='enrollment_created_keyset_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('status', 'Converted'), _negated=True), name='lead_open_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(models.F('status'), models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='lead_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(models.F('source'), models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='lead_source_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['created_by', 'next_call'], name='lead_owner_next_call_idx'),
+        ),
+    ]
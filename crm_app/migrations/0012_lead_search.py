@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the search indexes without locking the lead table against writes.
+    atomic = False
+
+    dependencies = [
+        ('crm_app', '0010_lead_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='phone_digits',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(models.F('phone_number'), models.Value('[^0-9]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE'), output_field=models.CharField(max_length=30)),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('student_name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('parents_name', config='simple', weight='A'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('email', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(models.Func(models.F('email'), models.Value('[@.]'), models.Value(' '), models.Value('g'), function='REGEXP_REPLACE'), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('city', config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector('remarks', config='simple', weight='D'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='whatsapp_digits',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(models.F('whatsapp_number'), models.Value('[^0-9]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE'), output_field=models.CharField(max_length=30)),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='lead_search_vector_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['phone_digits'], name='lead_phone_digits_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['whatsapp_digits'], name='lead_whatsapp_digits_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
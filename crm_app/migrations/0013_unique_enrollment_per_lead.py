@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # Concurrent conversions could create several enrollments for one lead.
+    # Keep the one carrying payment data (else the oldest) and drop the rest.
+    Enrollment = apps.get_model('crm_app', 'Enrollment')
+    duplicated = (
+        Enrollment.objects.filter(lead__isnull=False)
+        .values('lead').annotate(n=models.Count('id')).filter(n__gt=1)
+        .values_list('lead', flat=True)
+    )
+    for lead_id in duplicated:
+        enrollments = Enrollment.objects.filter(lead_id=lead_id).order_by('id')
+        keep = enrollments.filter(total_payment__isnull=False).first() or enrollments.first()
+        Enrollment.objects.filter(lead_id=lead_id).exclude(pk=keep.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0012_lead_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('lead',), name='unique_enrollment_per_lead'),
+        ),
+    ]
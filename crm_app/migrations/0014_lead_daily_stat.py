@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+def backfill_lead_daily_stats(apps, schema_editor):
+    Lead = apps.get_model('crm_app', 'Lead')
+    LeadDailyStat = apps.get_model('crm_app', 'LeadDailyStat')
+    rows = (
+        Lead.objects.values('add_date', 'status', 'source', 'course_id', 'created_by_id')
+        .annotate(n=models.Count('id')).order_by()
+    )
+    LeadDailyStat.objects.bulk_create([
+        LeadDailyStat(
+            day=row['add_date'], status=row['status'], source=row['source'],
+            course_id=row['course_id'], created_by_id=row['created_by_id'], count=row['n'],
+        )
+        for row in rows
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0013_unique_enrollment_per_lead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(null=True)),
+                ('status', models.CharField(choices=[('New', 'New'), ('Open', 'Open'), ('Average', 'Average'), ('Followup', 'Followup'), ('Interested', 'Interested'), ('inProgress', 'In Progress'), ('Active', 'Active'), ('Converted', 'Converted'), ('Lost', 'Lost'), ('Junk', 'Junk')], max_length=20)),
+                ('source', models.CharField(choices=[('WhatsApp/Viber', 'WhatsApp/Viber'), ('Facebook', 'Facebook'), ('Website', 'Website'), ('Email', 'Email'), ('Office Visit', 'Office Visit'), ('Direct Call', 'Direct Call'), ('LinkedIn', 'LinkedIn'), ('Other', 'Other')], max_length=30)),
+                ('course_id', models.BigIntegerField(null=True)),
+                ('created_by_id', models.BigIntegerField(null=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'source', 'course_id', 'created_by_id'), name='lead_daily_stat_bucket', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(backfill_lead_daily_stats, migrations.RunPython.noop),
+    ]
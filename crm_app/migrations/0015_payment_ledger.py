@@ -0,0 +1,114 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+import datetime
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+INSTALLMENTS = ['first_installment', 'second_installment', 'third_installment']
+
+
+def installments_to_payments(apps, schema_editor):
+    # Only last_pay_date was recorded, so it (or the enrollment date) is the
+    # best available paid_on for every installment.
+    Enrollment = apps.get_model('crm_app', 'Enrollment')
+    Payment = apps.get_model('crm_app', 'Payment')
+    enrollments = Enrollment.objects.filter(
+        models.Q(first_installment__isnull=False)
+        | models.Q(second_installment__isnull=False)
+        | models.Q(third_installment__isnull=False)
+    )
+    payments = []
+    for enrollment in enrollments.iterator(chunk_size=2000):
+        paid_on = enrollment.last_pay_date or (
+            enrollment.created_at.date() if enrollment.created_at else datetime.date.today()
+        )
+        for name in INSTALLMENTS:
+            amount = getattr(enrollment, name)
+            if amount:
+                payments.append(Payment(enrollment_id=enrollment.pk, amount=amount, paid_on=paid_on))
+        if len(payments) >= 5000:
+            Payment.objects.bulk_create(payments)
+            payments = []
+    Payment.objects.bulk_create(payments)
+
+    paid = models.Subquery(
+        Payment.objects.filter(enrollment=models.OuterRef('pk')).order_by().values('enrollment')
+        .annotate(total=models.Sum('amount')).values('total')
+    )
+    paid = Coalesce(paid, models.Value(Decimal('0.00')), output_field=models.DecimalField())
+    Enrollment.objects.update(amount_paid=paid, balance=models.F('total_payment') - paid)
+
+
+def payments_to_installments(apps, schema_editor):
+    Enrollment = apps.get_model('crm_app', 'Enrollment')
+    Payment = apps.get_model('crm_app', 'Payment')
+    for enrollment in Enrollment.objects.filter(payments__isnull=False).distinct().iterator(chunk_size=2000):
+        amounts = list(
+            Payment.objects.filter(enrollment=enrollment).order_by('paid_on', 'id').values_list('amount', flat=True)
+        )
+        # Anything beyond the third payment is folded into the third installment
+        if len(amounts) > 3:
+            amounts = amounts[:2] + [sum(amounts[2:])]
+        for name, amount in zip(INSTALLMENTS, amounts):
+            setattr(enrollment, name, amount)
+        enrollment.save(update_fields=INSTALLMENTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0014_lead_daily_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('paid_on', models.DateField()),
+                ('payment_type', models.CharField(blank=True, choices=[('Cash', 'Cash'), ('Online', 'Online'), ('Bank Transfer', 'Bank Transfer'), ('Cheque', 'Cheque')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='crm_app.enrollment')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(installments_to_payments, payments_to_installments),
+        migrations.RemoveField(
+            model_name='enrollment',
+            name='first_installment',
+        ),
+        migrations.RemoveField(
+            model_name='enrollment',
+            name='second_installment',
+        ),
+        migrations.RemoveField(
+            model_name='enrollment',
+            name='third_installment',
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(('balance__gt', 0), ('payment_completed', False)), fields=['last_pay_date'], name='enrollment_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['enrollment', 'paid_on'], name='payment_enrollment_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['paid_on'], name='payment_paid_on_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:44
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the lead and enrollment indexes without locking the tables against writes.
+    atomic = False
+
+    dependencies = [
+        ('crm_app', '0016_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lead', 'Lead'), ('enrollment', 'Enrollment')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='enrollment',
+            index=models.Index(fields=['updated_at', 'id'], name='enrollment_updated_sync_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['updated_at', 'id'], name='lead_updated_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['kind', 'deleted_at'], name='tombstone_sync_idx'),
+        ),
+    ]
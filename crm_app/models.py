@@ -1,5 +1,20 @@
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+
+def digits_only(field):
+    # Phone numbers are stored as typed; strip spaces, dashes, '+' etc. for matching.
+    return models.Func(
+        models.F(field), models.Value('[^0-9]'), models.Value(''), models.Value('g'),
+        function='REGEXP_REPLACE',
+    )
 
 class User(AbstractUser):
     class Roles(models.TextChoices):
@@ -8,6 +23,8 @@ class User(AbstractUser):
         SALES_REP = 'sales_rep', 'Sales Representative'
     
     role = models.CharField(max_length=20, choices=Roles.choices, default=Roles.SUPERADMIN)
+    # Bumped to revoke every access token issued to the user (see crm_app/authentication.py)
+    token_version = models.PositiveIntegerField(default=0)
 
     def is_superadmin(self):
         return self.role == self.Roles.SUPERADMIN
@@ -18,6 +35,12 @@ class User(AbstractUser):
     def is_sales_rep(self):
         return self.role == self.Roles.SALES_REP
 
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        # A password change logs out every token holder
+        if self.pk:
+            self.token_version += 1
+
 
 class Course(models.Model):
     course_name = models.CharField(max_length=255)
@@ -26,6 +49,12 @@ class Course(models.Model):
         return self.course_name
     
 
+class LeadManager(models.Manager):
+    def get_queryset(self):
+        # The search columns are only read inside SQL; don't ship them to Python.
+        return super().get_queryset().defer('search_vector', 'phone_digits', 'whatsapp_digits')
+
+
 class Lead(models.Model):
     # Status choices
     class StatusChoices(models.TextChoices):
@@ -130,24 +159,337 @@ class Lead(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Search columns, maintained by PostgreSQL as stored generated columns
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('student_name', weight='A', config='simple')
+            + SearchVector('parents_name', weight='A', config='simple')
+            + SearchVector('email', weight='B', config='simple')
+            # ...and its parts, so partial addresses ("sita@gmail") match too
+            + SearchVector(
+                models.Func(models.F('email'), models.Value('[@.]'), models.Value(' '), models.Value('g'),
+                            function='REGEXP_REPLACE'),
+                weight='B', config='simple',
+            )
+            + SearchVector('city', weight='C', config='simple')
+            + SearchVector('remarks', weight='D', config='simple')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    phone_digits = models.GeneratedField(
+        expression=digits_only('phone_number'), output_field=models.CharField(max_length=30), db_persist=True,
+    )
+    whatsapp_digits = models.GeneratedField(
+        expression=digits_only('whatsapp_number'), output_field=models.CharField(max_length=30), db_persist=True,
+    )
+
+    objects = LeadManager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='lead_search_vector_idx'),
+            # Sync: changes in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='lead_updated_sync_idx'),
+            models.Index(fields=['phone_digits'], name='lead_phone_digits_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['whatsapp_digits'], name='lead_whatsapp_digits_idx', opclasses=['varchar_pattern_ops']),
+            # Lead list: non-converted leads in keyset order (created_at DESC NULLS LAST, id DESC)
+            models.Index(
+                models.F('created_at').desc(nulls_last=True), models.F('id').desc(),
+                name='lead_open_created_idx',
+                condition=~models.Q(status='Converted'),
+            ),
+            # Lead list filtered by status / source, same keyset order
+            models.Index(
+                'status', models.F('created_at').desc(nulls_last=True), models.F('id').desc(),
+                name='lead_status_created_idx',
+            ),
+            models.Index(
+                'source', models.F('created_at').desc(nulls_last=True), models.F('id').desc(),
+                name='lead_source_created_idx',
+            ),
+            # Sales rep follow-ups: "my leads to call by date"
+            models.Index(fields=['created_by', 'next_call'], name='lead_owner_next_call_idx'),
+        ]
+
     def __str__(self):
         return self.student_name
 
+    # Dimensions of the LeadDailyStat analytics rollup
+    ROLLUP_FIELDS = ['add_date', 'status', 'source', 'course_id', 'created_by_id']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which rollup bucket the row was in, to move it on save.
+        loaded = not instance.get_deferred_fields().intersection(cls.ROLLUP_FIELDS)
+        instance._loaded_bucket = instance.rollup_bucket() if loaded else None
+        return instance
+
+    def rollup_bucket(self):
+        return tuple(getattr(self, name) for name in self.ROLLUP_FIELDS)
+
     @property
     def is_converted(self):
         return self.status == self.StatusChoices.CONVERTED
 
+class EnrollmentQuerySet(models.QuerySet):
+    def for_display(self):
+        # Joins lead and course and loads only the columns EnrollmentSerializer emits
+        # (plus the lead's updated_at, part of the enrollment's ETag).
+        return self.select_related('lead', 'course').only(
+            'id', 'lead', 'course', 'total_payment', 'amount_paid', 'balance', 'last_pay_date',
+            'payment_completed', 'created_at', 'updated_at',
+            'lead__student_name', 'lead__parents_name', 'lead__email', 'lead__phone_number', 'lead__updated_at',
+            'course__course_name',
+        )
+
+    def outstanding(self):
+        return self.filter(balance__gt=0, payment_completed=False)
+
+    def overdue(self, before):
+        # Served by the partial enrollment_overdue_idx; never-paid enrollments count from their creation date
+        return self.outstanding().filter(
+            models.Q(last_pay_date__lt=before)
+            | models.Q(last_pay_date__isnull=True, created_at__date__lt=before)
+        )
+
+    def refresh_balances(self):
+        """
+        Recompute amount_paid, balance and last_pay_date from the Payment ledger
+        in one UPDATE. Enrollments without payments keep their last_pay_date:
+        rows migrated from the installment columns may have no ledger entries.
+        """
+        payments = Payment.objects.filter(enrollment=models.OuterRef('pk')).order_by().values('enrollment')
+        paid = Coalesce(
+            models.Subquery(payments.annotate(total=models.Sum('amount')).values('total')),
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        return self.update(
+            amount_paid=paid,
+            balance=models.F('total_payment') - paid,
+            last_pay_date=Coalesce(
+                models.Subquery(payments.annotate(last=models.Max('paid_on')).values('last')),
+                models.F('last_pay_date'),
+            ),
+            updated_at=timezone.now(),
+        )
+
+
 class Enrollment(models.Model):
     lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='enrollments', null=True, blank=True)
     course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
     total_payment = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    first_installment = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    second_installment = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    third_installment = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Denormalized from the Payment ledger by EnrollmentQuerySet.refresh_balances()
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    balance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     last_pay_date = models.DateField(null=True, blank=True)
     payment_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EnrollmentQuerySet.as_manager()
+
+    LEDGER_FIELDS = ['amount_paid', 'balance', 'last_pay_date']
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lead'], name='unique_enrollment_per_lead'),
+        ]
+        indexes = [
+            models.Index(
+                models.F('created_at').desc(nulls_last=True), models.F('id').desc(),
+                name='enrollment_created_keyset_idx',
+            ),
+            models.Index(
+                fields=['last_pay_date'], name='enrollment_overdue_idx',
+                condition=models.Q(balance__gt=0, payment_completed=False),
+            ),
+            models.Index(fields=['updated_at', 'id'], name='enrollment_updated_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lead.student_name} - {self.course.course_name if self.course else ''}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_total_payment = instance.__dict__.get('total_payment')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # Nothing has been paid yet
+            total = self._meta.get_field('total_payment').to_python(self.total_payment)
+            self.balance = None if total is None else total - self.amount_paid
+            super().save(*args, **kwargs)
+            self._loaded_total_payment = self.total_payment
+            return
+
+        # The ledger columns are only written by refresh_balances(), so saving a
+        # stale instance can't undo a payment recorded since it was loaded.
+        if kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        if 'total_payment' in kwargs['update_fields'] and self.total_payment != self._loaded_total_payment:
+            Enrollment.objects.filter(pk=self.pk).update(balance=models.F('total_payment') - models.F('amount_paid'))
+            self.refresh_from_db(fields=['amount_paid', 'balance'])
+        self._loaded_total_payment = self.total_payment
+
+
+class Payment(models.Model):
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid_on = models.DateField()
+    payment_type = models.CharField(max_length=20, choices=Lead.PaymentTypeChoices.choices, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['enrollment', 'paid_on'], name='payment_enrollment_paid_idx'),
+            models.Index(fields=['paid_on'], name='payment_paid_on_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} on {self.paid_on}"
+
+
+class Tombstone(models.Model):
+    # Left behind by a deleted lead or enrollment so the sync endpoints can report it.
+    class Kinds(models.TextChoices):
+        LEAD = 'lead', 'Lead'
+        ENROLLMENT = 'enrollment', 'Enrollment'
+
+    kind = models.CharField(max_length=20, choices=Kinds.choices)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at'], name='tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at}"
+
+
+class Job(models.Model):
+    # Background work queued by the API and run by `manage.py run_jobs` (see crm_app/jobs.py)
+    class StatusChoices(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    task = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.QUEUED)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: due queued jobs, oldest first
+            models.Index(fields=['run_after', 'id'], name='job_queued_idx', condition=models.Q(status='queued')),
+            # Job list: a user's jobs, newest first
+            models.Index(fields=['created_by', '-created_at'], name='job_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class OutboxEvent(models.Model):
+    # Lead lifecycle event, written in the transaction that made the change (see crm_app/outbox.py)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the dispatcher has queued a delivery for each subscribed webhook
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='outbox_undispatched_idx', condition=models.Q(dispatched_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk}"
+
+
+class Webhook(models.Model):
+    url = models.URLField(max_length=500)
+    # Key for the X-CRM-Signature HMAC of each request body
+    secret = models.CharField(max_length=100)
+    # Event types to receive; empty for all
+    events = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='webhooks')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Consecutive failed deliveries, and when to try again (also the dispatcher's lease while sending)
+    failures = models.PositiveIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.url
+
+
+class WebhookDelivery(models.Model):
+    class StatusChoices(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DELIVERED = 'delivered', 'Delivered'
+        FAILED = 'failed', 'Failed'
+
+    webhook = models.ForeignKey(Webhook, on_delete=models.CASCADE, related_name='deliveries')
+    event = models.ForeignKey(OutboxEvent, on_delete=models.CASCADE, related_name='deliveries')
+    status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['webhook', 'event'], name='unique_delivery_per_webhook'),
+        ]
+        indexes = [
+            # The dispatcher's batch: a webhook's pending deliveries in event order
+            models.Index(fields=['webhook', 'id'], name='delivery_pending_idx', condition=models.Q(status='pending')),
+        ]
+
+    def __str__(self):
+        return f"{self.event} -> {self.webhook} ({self.status})"
+
+
+class LeadDailyStat(models.Model):
+    # Incrementally maintained rollup: number of leads added on `day` that are
+    # currently in each (status, source, course, created_by) bucket.
+    day = models.DateField(null=True)
+    status = models.CharField(max_length=20, choices=Lead.StatusChoices.choices)
+    source = models.CharField(max_length=30, choices=Lead.SourceChoices.choices)
+    course_id = models.BigIntegerField(null=True)
+    created_by_id = models.BigIntegerField(null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'source', 'course_id', 'created_by_id'],
+                name='lead_daily_stat_bucket',
+                nulls_distinct=False,
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.lead.student_name} - {self.course.course_name if self.course else ''}"
\ No newline at end of file
+        return f"{self.day} {self.status} {self.source}: {self.count}"
@@ -0,0 +1,48 @@
+from .models import Lead, OutboxEvent
+
+LEAD_CREATED = 'lead.created'
+LEAD_STATUS_CHANGED = 'lead.status_changed'
+LEAD_CONVERTED = 'lead.converted'
+EVENT_TYPES = [LEAD_CREATED, LEAD_STATUS_CHANGED, LEAD_CONVERTED]
+
+# What integrations get about a lead: contact details for follow-ups, source/adset_name for attribution
+LEAD_EVENT_FIELDS = [
+    'id', 'status', 'student_name', 'parents_name', 'email', 'phone_number', 'whatsapp_number',
+    'source', 'adset_name', 'course_id', 'created_by_id', 'next_call', 'created_at', 'updated_at',
+]
+
+
+def lead_data(lead):
+    return {name: getattr(lead, name) for name in LEAD_EVENT_FIELDS}
+
+
+def record(events):
+    """
+    Write (event_type, payload) pairs to the outbox. Call inside the
+    transaction that makes the change, so an event exists if and only if
+    the change commits; crm_app/webhooks.py delivers them afterwards.
+    """
+    OutboxEvent.objects.bulk_create([OutboxEvent(event_type=kind, payload=payload) for kind, payload in events])
+
+
+def record_leads_created(leads):
+    events = []
+    for lead in leads:
+        data = lead_data(lead)
+        events.append((LEAD_CREATED, {'lead': data}))
+        if lead.status == Lead.StatusChoices.CONVERTED:
+            events.append((LEAD_CONVERTED, {'lead': data}))
+    record(events)
+
+
+def record_status_changes(leads, previous):
+    """``previous`` maps lead id to its status before the change; unchanged leads are skipped."""
+    events = []
+    for lead in leads:
+        if lead.status == previous[lead.pk]:
+            continue
+        data = lead_data(lead)
+        events.append((LEAD_STATUS_CHANGED, {'lead': data, 'previous_status': previous[lead.pk]}))
+        if lead.status == Lead.StatusChoices.CONVERTED:
+            events.append((LEAD_CONVERTED, {'lead': data}))
+    record(events)
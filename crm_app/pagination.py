@@ -0,0 +1,152 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(position):
+    data = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor.')
+
+
+def keyset_ordering(field, descending):
+    # NULLs always sort last so that the nullable branch can be read separately.
+    if descending:
+        return [F(field).desc(nulls_last=True), F('id').desc()]
+    return [F(field).asc(nulls_last=True), F('id').asc()]
+
+
+def keyset_filter(field, value, pk, descending):
+    """
+    Rows strictly after (value, pk) in keyset order, restricted to the
+    non-NULL (or NULL, when value is None) part of the ordering column.
+    Written so that ``field <= value`` is usable as an index range condition.
+    """
+    if value is None:
+        return Q(**{f'{field}__isnull': True, 'id__lt' if descending else 'id__gt': pk})
+    if descending:
+        return Q(**{f'{field}__lte': value}) & (Q(**{f'{field}__lt': value}) | Q(id__lt=pk))
+    return Q(**{f'{field}__gte': value}) & (Q(**{f'{field}__gt': value}) | Q(id__gt=pk))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id). Each page is a single
+    index range scan with LIMIT, so deep pages cost the same as the first one.
+
+    Opt-in: the response is only paginated when the client sends ``cursor``
+    or ``page_size``, so existing consumers of the plain list keep working.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = '-created_at'
+
+    def __init__(self):
+        self.page_size = settings.LIST_PAGE_SIZE
+        self.max_page_size = settings.LIST_MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        # Honour a client-chosen ?ordering= (first term only, id breaks ties).
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering and ordering[0].lstrip('-') != 'id':
+                    return ordering[0]
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def prepare(self, queryset, request, view):
+        """The page query, plus the NULL-tail query to continue into when it runs short."""
+        self.request = request
+        ordering = self.get_ordering(request, queryset, view)
+        descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        model_field = queryset.model._meta.get_field(self.field)
+        self.size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*keyset_ordering(self.field, descending))
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return queryset, None
+        position = decode_cursor(token)
+        try:
+            value, pk = position['v'], int(position['pk'])
+            if value is not None:
+                value = model_field.to_python(value)
+        except Exception:
+            raise NotFound('Invalid cursor.')
+        tail = None
+        # Once the non-NULL values run out, continue into the NULL tail.
+        if value is not None and model_field.null:
+            tail = queryset.filter(**{f'{self.field}__isnull': True})
+        return queryset.filter(keyset_filter(self.field, value, pk, descending)), tail
+
+    def finish(self, rows):
+        self.has_next = len(rows) > self.size
+        self.page = rows[:self.size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        queryset, tail = self.prepare(queryset, request, view)
+        rows = list(queryset[:self.size + 1])
+        if tail is not None and len(rows) <= self.size:
+            rows += list(tail[:self.size + 1 - len(rows)])
+        return self.finish(rows)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, using the async ORM."""
+        if not self.is_requested(request):
+            return None
+        queryset, tail = self.prepare(queryset, request, view)
+        rows = [row async for row in queryset[:self.size + 1]]
+        if tail is not None and len(rows) <= self.size:
+            rows += [row async for row in tail[:self.size + 1 - len(rows)]]
+        return self.finish(rows)
+
+    def get_position(self, row):
+        value = row[self.field] if isinstance(row, dict) else getattr(row, self.field)
+        pk = row['id'] if isinstance(row, dict) else row.pk
+        if value is not None and hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return {'v': value, 'pk': pk}
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        token = encode_cursor(self.get_position(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,113 @@
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.utils import timezone
+
+from .db_router import reading_from_primary
+from .models import Enrollment
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+
+def month_key(month):
+    return f'revenue-report:{month:%Y-%m}'
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def as_datetime(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def iter_months(start, end):
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def invalidate_revenue_month(created_at):
+    """Drop the cached report for the month an enrollment belongs to, once committed."""
+    if created_at is None:
+        return
+    key = month_key(timezone.localtime(created_at))
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def compute_months(start, end, as_of):
+    """Collected / outstanding / overdue per (month, course, payment_completed), in one query."""
+    outstanding = Greatest(Coalesce('balance', ZERO), ZERO)
+    overdue_before = as_of - datetime.timedelta(days=settings.PAYMENT_OVERDUE_DAYS)
+    overdue = Q(payment_completed=False) & (
+        Q(last_pay_date__lt=overdue_before)
+        | Q(last_pay_date__isnull=True, created_at__date__lt=overdue_before)
+    )
+    rows = (
+        Enrollment.objects
+        .filter(created_at__gte=as_datetime(start), created_at__lt=as_datetime(next_month(end)))
+        .annotate(month=TruncMonth('created_at'))
+        .values('month', 'course_id', 'payment_completed')
+        .annotate(
+            enrollments=Count('id'),
+            total=Coalesce(Sum('total_payment'), ZERO),
+            collected=Coalesce(Sum('amount_paid'), ZERO),
+            outstanding=Coalesce(Sum(outstanding, output_field=MONEY), ZERO),
+            overdue=Coalesce(Sum(outstanding, filter=overdue, output_field=MONEY), ZERO),
+        )
+        .order_by('month', 'course_id', 'payment_completed')
+    )
+    months = {month: [] for month in iter_months(start, end)}
+    for row in rows:
+        months[month_start(timezone.localtime(row['month']))].append({
+            'course': row['course_id'],
+            'payment_completed': row['payment_completed'],
+            'enrollments': row['enrollments'],
+            **{name: str(row[name]) for name in ['total', 'collected', 'outstanding', 'overdue']},
+        })
+    return months
+
+
+def revenue_report(start, end):
+    """
+    Per-month rows, each month cached separately so an enrollment change only
+    recomputes its own month. Entries are also recomputed once a day, since
+    "overdue" depends on today's date. The current month is still taking
+    enrollments, so it (and any later month) is always computed, never cached.
+    """
+    as_of = timezone.localdate()
+    months = list(iter_months(start, end))
+    closed = [month for month in months if month < month_start(as_of)]
+    cached = cache.get_many([month_key(month) for month in closed])
+    report, missing = {}, []
+    for month in months:
+        entry = cached.get(month_key(month))
+        if entry is not None and entry['as_of'] == as_of:
+            report[month] = entry['rows']
+        else:
+            missing.append(month)
+
+    if missing:
+        with reading_from_primary():
+            computed = compute_months(missing[0], missing[-1], as_of)
+        cache.set_many(
+            {month_key(month): {'as_of': as_of, 'rows': computed[month]} for month in missing if month in closed},
+            settings.REPORT_CACHE_TTL,
+        )
+        report.update({month: computed[month] for month in missing})
+
+    return [
+        {'month': month.isoformat(), **row}
+        for month in months for row in report[month]
+    ]
@@ -0,0 +1,38 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+
+# Characters with a meaning in tsquery syntax
+TSQUERY_SPECIAL = re.compile(r"[&|!():*<>'\\]")
+PHONE_PUNCTUATION = re.compile(r'[\s+\-().]')
+MIN_PHONE_DIGITS = 3
+
+
+def build_tsquery(term):
+    """Prefix-match every word: 'ram sha' -> 'ram':* & 'sha':*"""
+    words = [TSQUERY_SPECIAL.sub('', word) for word in term.split()]
+    return ' & '.join(f"'{word}':*" for word in words if word)
+
+
+def search_leads(queryset, term):
+    """
+    Phone-like terms match the normalized phone/WhatsApp numbers by prefix,
+    everything else goes through the GIN-indexed search_vector, best match first.
+    """
+    term = term.strip()
+    digits = PHONE_PUNCTUATION.sub('', term)
+    if digits.isdigit() and len(digits) >= MIN_PHONE_DIGITS:
+        return queryset.filter(
+            Q(phone_digits__startswith=digits) | Q(whatsapp_digits__startswith=digits)
+        ).order_by('-id')
+
+    raw = build_tsquery(term)
+    if not raw:
+        return queryset.none()
+    query = SearchQuery(raw, search_type='raw', config='simple')
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', '-id')
+    )
@@ -1,10 +1,77 @@
+import secrets
+
+from django.urls import reverse
 from rest_framework import serializers
-from .models import User, Course, Lead, Enrollment
+from .models import User, Course, Lead, Enrollment, Payment, Job, Webhook
+from .outbox import EVENT_TYPES
 
 class LeadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lead
-        fields = '__all__'
+        # Search columns are generated by the database and not part of the API
+        exclude = ['search_vector', 'phone_digits', 'whatsapp_digits']
+
+
+class LeadImportSerializer(LeadSerializer):
+    # Courses are resolved from a dict in the context instead of one query per row
+    course = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta(LeadSerializer.Meta):
+        read_only_fields = ['created_by']
+
+    def validate_course(self, value):
+        if value is None:
+            return None
+        course = self.context['courses'].get(value)
+        if course is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return course
+
+
+class LeadBulkUpdateSerializer(serializers.Serializer):
+    # Fields a bulk PATCH may change; everything else goes through the detail endpoint.
+    UPDATABLE_FIELDS = ['status', 'next_call', 'last_call', 'course', 'created_by', 'shift', 'class_type']
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=10000)
+    filter = serializers.DictField(required=False, allow_empty=False)
+    update = serializers.DictField(allow_empty=False)
+
+    def validate_update(self, value):
+        unknown = sorted(set(value) - set(self.UPDATABLE_FIELDS))
+        if unknown:
+            raise serializers.ValidationError(f"Fields cannot be bulk updated: {', '.join(unknown)}.")
+        serializer = LeadSerializer(data=value, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def validate(self, attrs):
+        if 'ids' not in attrs and 'filter' not in attrs:
+            raise serializers.ValidationError("Provide 'ids' or 'filter' to select the leads to update.")
+        return attrs
+
+
+class CallQueueSerializer(serializers.ModelSerializer):
+    # Only what a rep needs to make the call
+    course_name = serializers.CharField(source='course.course_name', read_only=True, default=None)
+
+    class Meta:
+        model = Lead
+        fields = [
+            'id', 'status', 'student_name', 'parents_name', 'phone_number', 'whatsapp_number',
+            'course', 'course_name', 'shift', 'last_call', 'next_call', 'remarks',
+        ]
+
+
+class LogCallSerializer(serializers.Serializer):
+    # null takes the lead out of the call queue
+    next_call = serializers.DateField(allow_null=True)
+    # Notes from the call; replace the lead's remarks when given
+    remarks = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+
+    def validate_next_call(self, value):
+        if value is not None and value <= self.context['today']:
+            raise serializers.ValidationError("Schedule the next call after today.")
+        return value
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -33,21 +100,39 @@ class EnrollmentSerializer(serializers.ModelSerializer):
             'phone_number',
             'course_name',
             'total_payment',
-            'first_installment',
-            'second_installment', 
-            'third_installment',
+            'amount_paid',
+            'balance',
             'last_pay_date',
             'payment_completed',
             'created_at',
             'updated_at'
         ]
+        # Maintained from the Payment ledger
+        read_only_fields = ['amount_paid', 'balance', 'last_pay_date']
 
     def validate_lead(self, lead):
         if lead.status != lead.StatusChoices.CONVERTED:
             raise serializers.ValidationError("Only leads with status 'Converted' can be enrolled.")
+        enrollments = Enrollment.objects.filter(lead=lead)
+        if self.instance is not None:
+            enrollments = enrollments.exclude(pk=self.instance.pk)
+        if enrollments.exists():
+            raise serializers.ValidationError("This lead is already enrolled.")
         return lead
 
 
+class PaymentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = ['id', 'enrollment', 'amount', 'paid_on', 'payment_type', 'created_at', 'updated_at']
+        read_only_fields = ['enrollment']
+
+    def validate_amount(self, amount):
+        if amount <= 0:
+            raise serializers.ValidationError("Amount must be greater than zero.")
+        return amount
+
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -77,4 +162,43 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         user = User(**validated_data)
         user.set_password(password)
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+class JobSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='job-detail')
+    # The last traceback line; the full traceback stays in the admin
+    error = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'url', 'task', 'status', 'result', 'error', 'attempts', 'max_attempts',
+            'run_after', 'created_by', 'created_at', 'started_at', 'finished_at', 'download_url',
+        ]
+        read_only_fields = fields
+
+    def get_error(self, job):
+        lines = job.error.strip().splitlines()
+        return lines[-1] if lines else ''
+
+    def get_download_url(self, job):
+        if job.status != Job.StatusChoices.SUCCEEDED or not (job.result or {}).get('file'):
+            return None
+        return self.context['request'].build_absolute_uri(reverse('job-download', args=[job.pk]))
+
+
+class WebhookSerializer(serializers.ModelSerializer):
+    # Generated when not given; receivers check X-CRM-Signature: sha256=HMAC(secret, body)
+    secret = serializers.CharField(max_length=100, required=False)
+    events = serializers.ListField(child=serializers.ChoiceField(choices=EVENT_TYPES), required=False)
+
+    class Meta:
+        model = Webhook
+        fields = ['id', 'url', 'secret', 'events', 'is_active', 'failures', 'retry_after', 'created_by', 'created_at']
+        read_only_fields = ['failures', 'retry_after', 'created_by', 'created_at']
+
+    def create(self, validated_data):
+        validated_data.setdefault('secret', secrets.token_hex(32))
+        return super().create(validated_data)
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import record_leads_updated
+from .filters import LeadFilter
+from .models import Enrollment, Lead
+from .outbox import LEAD_EVENT_FIELDS, record_status_changes
+from .reports import invalidate_revenue_month
+
+
+def convert_leads(leads):
+    """
+    Make sure every lead in ``leads`` has an enrollment.
+
+    A single INSERT ... ON CONFLICT DO NOTHING: the unique constraint on
+    Enrollment.lead turns concurrent conversions of the same lead into no-ops
+    instead of duplicates, without a prior exists() round trip.
+    """
+    enrollments = [Enrollment(lead_id=lead.pk, course_id=lead.course_id) for lead in leads]
+    if enrollments:
+        Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True)
+        # bulk_create sends no post_save, so expire this month's revenue report here
+        invalidate_revenue_month(timezone.now())
+
+
+def convert_lead(lead):
+    convert_leads([lead])
+
+
+# Leads that no longer need follow-up calls
+CLOSED_STATUSES = [Lead.StatusChoices.CONVERTED, Lead.StatusChoices.LOST, Lead.StatusChoices.JUNK]
+CALL_QUEUE_FIELDS = [
+    'id', 'status', 'student_name', 'parents_name', 'phone_number', 'whatsapp_number',
+    'course', 'course__course_name', 'shift', 'last_call', 'next_call', 'remarks',
+]
+
+
+def call_queue(user_id, day):
+    """
+    The user's open leads with a call due on or before ``day``, most overdue
+    first. A range scan on lead_owner_next_call_idx (created_by, next_call).
+    """
+    return (
+        Lead.objects.filter(created_by_id=user_id, next_call__lte=day)
+        .exclude(status__in=CLOSED_STATUSES)
+        .select_related('course')
+        .only(*CALL_QUEUE_FIELDS)
+        .order_by('next_call', 'id')
+    )
+
+
+def log_call(lead_id, day, next_call, **changes):
+    """
+    Record a call made on ``day`` (and any other ``changes``, e.g. remarks)
+    in a single UPDATE. Returns False if the lead doesn't exist.
+    """
+    return Lead.objects.filter(pk=lead_id).update(
+        last_call=day, next_call=next_call, updated_at=timezone.now(), **changes,
+    ) > 0
+
+
+def bulk_update_leads(selection, changes, batch_size=1000):
+    """
+    Apply validated LeadBulkUpdateSerializer data: ``changes`` to the leads
+    picked by ``ids`` and/or list ``filter`` parameters. Returns the number updated.
+
+    The selection is walked in id order, ``batch_size`` leads per transaction,
+    so a broad filter never locks or loads the whole table at once.
+    """
+    queryset = Lead.objects.all()
+    if 'ids' in selection:
+        queryset = queryset.filter(id__in=selection['ids'])
+    if 'filter' in selection:
+        queryset = LeadFilter(selection['filter']).filter_queryset(queryset)
+    queryset = queryset.order_by('id')
+
+    updated = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Resolve the batch first: the update may change the columns it filters on.
+            previous = dict(
+                queryset.filter(id__gt=last_id).select_for_update(of=('self',))
+                .values_list('id', 'status')[:batch_size]
+            )
+            if not previous:
+                return updated
+            last_id = max(previous)
+            updated += update_lead_batch(previous, changes)
+
+
+def update_lead_batch(previous, changes):
+    """``previous`` maps the locked leads' ids to their current status."""
+    selected = Lead.objects.filter(id__in=list(previous))
+    record_leads_updated(selected, changes)
+    updated = selected.update(**changes, updated_at=timezone.now())
+
+    if changes.get('status') == Lead.StatusChoices.CONVERTED:
+        convert_leads(selected.only('id', 'course_id'))
+    if 'status' in changes:
+        moved = [pk for pk, status in previous.items() if status != changes['status']]
+        record_status_changes(Lead.objects.filter(id__in=moved).only(*LEAD_EVENT_FIELDS), previous)
+    return updated
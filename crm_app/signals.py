@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analytics, reports, sync
+from .authentication import invalidate_user_state
+from .caching import COURSE_LIST_KEY, course_detail_key
+from .models import Course, Enrollment, Lead, Payment, User
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    # After commit, so a concurrent request can't re-cache the old rows.
+    keys = [COURSE_LIST_KEY, course_detail_key(instance.pk)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_save, sender=Lead)
+def update_lead_rollup_on_save(sender, instance, created, **kwargs):
+    analytics.record_lead_saved(instance, created)
+
+
+@receiver(post_delete, sender=Lead)
+def update_lead_rollup_on_delete(sender, instance, **kwargs):
+    analytics.record_lead_deleted(instance)
+
+
+@receiver(post_delete, sender=Course)
+def reassign_course_rollups(sender, instance, **kwargs):
+    analytics.reassign_dimension('course_id', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def reassign_user_rollups(sender, instance, **kwargs):
+    analytics.reassign_dimension('created_by_id', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_revenue_report(sender, instance, **kwargs):
+    reports.invalidate_revenue_month(instance.created_at)
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def refresh_enrollment_balance(sender, instance, **kwargs):
+    enrollments = Enrollment.objects.filter(pk=instance.enrollment_id)
+    enrollments.refresh_balances()
+    created_at = enrollments.values_list('created_at', flat=True).first()
+    reports.invalidate_revenue_month(created_at)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_token_state(sender, instance, **kwargs):
+    # Role, is_active and token_version changes reach token holders right away
+    invalidate_user_state(instance.pk)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Enrollment)
+def record_tombstone(sender, instance, **kwargs):
+    # Also runs for enrollments deleted along with their lead
+    sync.record_deleted(instance)
+
+
+@receiver(post_save, sender=Lead)
+def touch_lead_enrollment(sender, instance, created, **kwargs):
+    # The enrollment repeats the student and parent columns
+    if not created:
+        sync.touch(Enrollment.objects.filter(lead=instance))
+
+
+@receiver(post_save, sender=Course)
+def touch_course_enrollments(sender, instance, created, **kwargs):
+    if not created:
+        sync.touch(Enrollment.objects.filter(course=instance))
+
+
+@receiver(pre_delete, sender=Course)
+def touch_course_rows(sender, instance, **kwargs):
+    # on_delete=SET_NULL doesn't bump updated_at
+    sync.touch(Lead.objects.filter(course=instance))
+    sync.touch(Enrollment.objects.filter(course=instance))
+
+
+@receiver(pre_delete, sender=User)
+def touch_user_leads(sender, instance, **kwargs):
+    sync.touch(Lead.objects.filter(created_by=instance))
@@ -0,0 +1,87 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from .models import Enrollment, Lead, Tombstone
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+
+TOMBSTONE_KINDS = {Lead: Tombstone.Kinds.LEAD, Enrollment: Tombstone.Kinds.ENROLLMENT}
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Deletions this old are no longer tracked; sync again without since or cursor.'
+    default_code = 'sync_expired'
+
+
+def record_deleted(instance):
+    Tombstone.objects.create(kind=TOMBSTONE_KINDS[type(instance)], object_id=instance.pk)
+
+
+def touch(queryset):
+    """Bump updated_at on rows whose representation changed through another table."""
+    return queryset.update(updated_at=timezone.now())
+
+
+def tombstone_horizon():
+    return timezone.now() - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+
+def read_position(params):
+    """
+    Where a sync page starts: (timestamp, id) to continue strictly after,
+    (since, None) to start at ``since`` inclusive, or (None, None) for
+    everything.
+    """
+    if params.get('cursor'):
+        position = decode_cursor(params['cursor'])
+        try:
+            timestamp, pk = parse_datetime(position['t']), int(position['pk'])
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if timestamp is None:
+            raise NotFound('Invalid cursor.')
+    elif params.get('since'):
+        try:
+            timestamp, pk = parse_datetime(params['since']), None
+        except ValueError:
+            timestamp = None
+        if timestamp is None:
+            raise ValidationError({'since': 'Expected an ISO 8601 datetime.'})
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+    else:
+        return None, None
+    # Older tombstones may have been pruned; the client has to start over
+    if timestamp < tombstone_horizon():
+        raise SyncExpired()
+    return timestamp, pk
+
+
+def write_position(timestamp, pk):
+    return encode_cursor({'t': timestamp.isoformat(), 'pk': pk})
+
+
+def changed_after(queryset, position, until):
+    """Rows changed after ``position`` and no later than ``until``, in (updated_at, id) order."""
+    timestamp, pk = position
+    queryset = queryset.filter(updated_at__lte=until).order_by('updated_at', 'id')
+    if timestamp is None:
+        return queryset
+    if pk is None:
+        return queryset.filter(updated_at__gte=timestamp)
+    return queryset.filter(keyset_filter('updated_at', timestamp, pk, descending=False))
+
+
+def deleted_between(kind, position, end):
+    """Ids of ``kind`` rows deleted after ``position`` and no later than ``end``."""
+    timestamp, pk = position
+    tombstones = Tombstone.objects.filter(kind=kind, deleted_at__lte=end)
+    if timestamp is not None:
+        lookup = 'deleted_at__gte' if pk is None else 'deleted_at__gt'
+        tombstones = tombstones.filter(**{lookup: timestamp})
+    return list(tombstones.order_by('deleted_at', 'id').values_list('object_id', flat=True))
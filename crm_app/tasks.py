@@ -0,0 +1,80 @@
+import datetime
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+
+from . import views
+from .exporters import ENROLLMENT_EXPORT_COLUMNS, LEAD_EXPORT_COLUMNS, iter_csv
+from .importers import LeadImporter
+from .jobs import JobFailed, task
+from .reports import revenue_report
+from .serializers import LeadBulkUpdateSerializer
+from .services import bulk_update_leads
+
+
+def filtered_queryset(view_class, params):
+    """The queryset ``view_class`` lists for these query parameters ({name: [values]})."""
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(mutable=True)
+    for name, values in params.items():
+        http_request.GET.setlist(name, values)
+    view = view_class(request=Request(http_request), format_kwarg=None, args=(), kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+def export_csv(job, view_class, columns, name):
+    queryset = filtered_queryset(view_class, job.payload.get('query', {}))
+    rows = -1  # header
+    with tempfile.TemporaryFile() as output:
+        for line in iter_csv(queryset, columns):
+            output.write(line.encode())
+            rows += 1
+        output.seek(0)
+        filename = f"{name}-{timezone.localdate().isoformat()}.csv"
+        path = default_storage.save(f'jobs/{job.pk}/{filename}', File(output))
+    return {'file': path, 'rows': rows}
+
+
+@task('export_leads')
+def export_leads(job):
+    return export_csv(job, views.LeadExportView, LEAD_EXPORT_COLUMNS, 'leads')
+
+
+@task('export_enrollments')
+def export_enrollments(job):
+    return export_csv(job, views.EnrollmentExportView, ENROLLMENT_EXPORT_COLUMNS, 'enrollments')
+
+
+@task('import_leads')
+def import_leads(job):
+    path = job.payload['file']
+    try:
+        with default_storage.open(path, 'rb') as lines:
+            report = LeadImporter(user=job.created_by).run(lines, job.payload['format'])
+    finally:
+        default_storage.delete(path)
+    report['file_name'] = os.path.basename(path)
+    return report
+
+
+@task('bulk_update_leads')
+def bulk_update(job):
+    # Validated again: a course or user named in the update may be gone by now,
+    # and would be on every retry too
+    serializer = LeadBulkUpdateSerializer(data=job.payload)
+    if not serializer.is_valid():
+        raise JobFailed('The update is no longer valid.', {'errors': serializer.errors})
+    data = serializer.validated_data
+    return {'updated': bulk_update_leads(data, data['update'])}
+
+
+@task('revenue_report')
+def build_revenue_report(job):
+    start, end = (datetime.date.fromisoformat(job.payload[name]) for name in ('start', 'end'))
+    return revenue_report(start, end)
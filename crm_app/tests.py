@@ -1,3 +1,1333 @@
-from django.test import TestCase
+import datetime
+import json
+import shutil
+import signal
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import requests
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from .analytics import STAT_FIELDS, lead_bucket_counts
+from .authentication import decode_token, issue_token
+from .db_router import PRIMARY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware
+from .fastlist import RowBuilder
+from .importers import LeadImporter
+from .jobs import TASKS, enqueue, run_pending
+from .management.worker import WorkerCommand
+from .models import User, Course, Lead, Enrollment, Job, LeadDailyStat, OutboxEvent, Payment, Webhook, WebhookDelivery
+from .pagination import encode_cursor
+from .reports import as_datetime, month_key, month_start, next_month, revenue_report
+from .serializers import CallQueueSerializer, EnrollmentSerializer
+from .services import bulk_update_leads, convert_leads
+from .throttling import RoleRateThrottle
+from .webhooks import sign
+
+
+def make_lead(model=Lead, **kwargs):
+    data = {
+        'parents_name': 'Parent',
+        'student_name': 'Student',
+        'email': 'parent@example.com',
+        'phone_number': '9800000000',
+        'whatsapp_number': '9800000000',
+        'age': '10',
+        'grade': '5',
+        'source': Lead.SourceChoices.FACEBOOK,
+        'class_type': Lead.ClassTypeChoices.ONLINE,
+    }
+    data.update(kwargs)
+    return model.objects.create(**data)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pass', role=User.Roles.ADMIN))
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_pages_continue_into_null_created_at_tail(self):
+        leads = [make_lead(student_name=f'Student {i}') for i in range(5)]
+        Lead.objects.filter(pk__in=[leads[0].pk, leads[1].pk]).update(created_at=None)
+        expected = [lead.pk for lead in reversed(leads[2:])] + [leads[1].pk, leads[0].pk]
+        self.assertEqual(self.collect('/api/leads/?page_size=2'), expected)
+
+    def test_custom_ordering(self):
+        today = timezone.localdate()
+        late = make_lead(next_call=today + datetime.timedelta(days=2))
+        early = make_lead(next_call=today)
+        unscheduled = make_lead()
+        self.assertEqual(
+            self.collect('/api/leads/?page_size=1&ordering=next_call'), [early.pk, late.pk, unscheduled.pk],
+        )
+        self.assertEqual(
+            self.collect('/api/leads/?page_size=1&ordering=-next_call'), [late.pk, early.pk, unscheduled.pk],
+        )
+
+    def test_invalid_or_tampered_cursor_is_not_found(self):
+        make_lead()
+        for token in ['zzz', encode_cursor({'v': 'not-a-date', 'pk': 1}), encode_cursor({'v': None, 'pk': 'x'}),
+                      encode_cursor(['v', 'pk'])]:
+            self.assertEqual(self.client.get('/api/leads/', {'cursor': token}).status_code, 404, token)
+
+    @override_settings(LIST_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        for i in range(3):
+            make_lead(student_name=f'Student {i}')
+        response = self.client.get('/api/leads/?page_size=100')
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_rows_inserted_between_pages_do_not_shift_results(self):
+        leads = [make_lead(student_name=f'Student {i}') for i in range(4)]
+        first = self.client.get('/api/leads/?page_size=2').json()
+        make_lead(student_name='Newer')
+        ids = [row['id'] for row in first['results']] + self.collect(first['next'])
+        self.assertEqual(ids, [lead.pk for lead in reversed(leads)])
+
+    def test_unpaginated_without_cursor_or_page_size(self):
+        make_lead()
+        self.assertIsInstance(self.client.get('/api/leads/').json(), list)
+
+
+class EnrollmentQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pass', role=User.Roles.ADMIN))
+
+    def create_enrollments(self, count):
+        for i in range(count):
+            course = Course.objects.create(course_name=f'Course {i}')
+            lead = make_lead(student_name=f'Student {i}', course=course, status=Lead.StatusChoices.CONVERTED)
+            Enrollment.objects.create(lead=lead, course=course)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/enrollments/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self.create_enrollments(2)
+        small, _ = self.count_list_queries()
+        self.create_enrollments(8)
+        large, data = self.count_list_queries()
+        self.assertEqual(len(data), 10)
+        self.assertEqual(small, large)
+
+    def test_list_includes_related_fields(self):
+        self.create_enrollments(1)
+        _, data = self.count_list_queries()
+        self.assertEqual(data[0]['student_name'], 'Student 0')
+        self.assertEqual(data[0]['course_name'], 'Course 0')
+
+    def test_detail_uses_single_query(self):
+        self.create_enrollments(1)
+        enrollment = Enrollment.objects.get()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/enrollments/{enrollment.pk}/')
+        self.assertEqual(response.json()['parents_name'], 'Parent')
+
+
+class LeadFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+
+    def ids(self, params):
+        response = self.client.get('/api/leads/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()}
+
+    def test_choice_filters(self):
+        new = make_lead(status=Lead.StatusChoices.NEW, source=Lead.SourceChoices.FACEBOOK)
+        lost = make_lead(status=Lead.StatusChoices.LOST, source=Lead.SourceChoices.FACEBOOK)
+        website = make_lead(status=Lead.StatusChoices.NEW, source=Lead.SourceChoices.WEBSITE)
+        self.assertEqual(self.ids({'status': 'New'}), {new.pk, website.pk})
+        self.assertEqual(self.ids({'status': 'New,Lost'}), {new.pk, lost.pk, website.pk})
+        self.assertEqual(self.ids({'status': ['New', 'Lost'], 'source': 'Website'}), {website.pk})
+        # The list never shows converted leads, even when asked for
+        make_lead(status=Lead.StatusChoices.CONVERTED)
+        self.assertEqual(self.ids({'status': 'Converted'}), set())
+
+    def test_id_filters(self):
+        python = Course.objects.create(course_name='Python')
+        scratch = Course.objects.create(course_name='Scratch')
+        in_python, in_scratch, _ = make_lead(course=python), make_lead(course=scratch), make_lead()
+        self.assertEqual(self.ids({'course': python.pk}), {in_python.pk})
+        self.assertEqual(self.ids({'course': f'{python.pk},{scratch.pk}'}), {in_python.pk, in_scratch.pk})
+
+    def test_date_ranges_are_inclusive(self):
+        day = datetime.date(2025, 1, 15)
+        before, on, after = [make_lead(next_call=day + datetime.timedelta(days=offset)) for offset in [-1, 0, 1]]
+        make_lead()
+        self.assertEqual(self.ids({'next_call_after': '2025-01-15'}), {on.pk, after.pk})
+        self.assertEqual(self.ids({'next_call_before': '2025-01-15'}), {before.pk, on.pk})
+        self.assertEqual(self.ids({'next_call_after': '2025-01-15', 'next_call_before': '2025-01-15'}), {on.pk})
+
+    def test_invalid_values_are_rejected(self):
+        make_lead()
+        for params, field in [
+            ({'status': 'Nwe'}, 'status'),
+            ({'source': 'Facebook,Billboard'}, 'source'),
+            ({'course': 'python'}, 'course'),
+            ({'created_by': '-1'}, 'created_by'),
+            ({'next_call_after': '2025-02-30'}, 'next_call_after'),
+            ({'add_date_before': 'yesterday'}, 'add_date_before'),
+        ]:
+            response = self.client.get('/api/leads/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(field, response.json())
+        # Out of range for the column: no match rather than a database error
+        self.assertEqual(self.ids({'course': '99999999999999999999999'}), set())
+
+    def test_ordering_is_whitelisted(self):
+        first = make_lead(student_name='Asha', email='a@example.com')
+        second = make_lead(student_name='Bina', email='b@example.com')
+        response = self.client.get('/api/leads/', {'ordering': 'student_name'})
+        self.assertEqual([row['id'] for row in response.json()], [first.pk, second.pk])
+        # Not in ordering_fields: ignored, the default (newest first) applies
+        for ordering in ['email', '-email', 'created_by__password']:
+            response = self.client.get('/api/leads/', {'ordering': ordering})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['id'] for row in response.json()], [second.pk, first.pk], ordering)
+
+
+class LeadSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('rep', role=User.Roles.SALES_REP))
+
+    def search(self, **params):
+        response = self.client.get('/api/leads/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()]
+
+    def test_name_matches_rank_above_remarks(self):
+        in_remarks = make_lead(student_name='Asha', remarks='Sibling of Ramesh')
+        by_name = make_lead(student_name='Ramesh Shrestha')
+        make_lead(student_name='Sita')
+        # Prefix match on every word
+        self.assertEqual(self.search(q='rame'), [by_name.pk, in_remarks.pk])
+        self.assertEqual(self.search(q='ram shr'), [by_name.pk])
+
+    def test_phone_prefix(self):
+        lead = make_lead(phone_number='980-123 4567')
+        whatsapp = make_lead(whatsapp_number='9801299999')
+        make_lead(phone_number='9811111111')
+        self.assertEqual(self.search(q='980-12'), [whatsapp.pk, lead.pk])
+        self.assertEqual(self.search(q='(980) 123'), [lead.pk])
+
+    def test_empty_or_punctuation_only_terms(self):
+        lead = make_lead(student_name='Asha')
+        for term in ['', '   ', "&|!():*", "'", '\\']:
+            self.assertEqual(self.search(q=term), [], term)
+        # tsquery syntax is stripped, not interpreted
+        self.assertEqual(self.search(q="as'h&a|"), [lead.pk])
+
+    def test_limit_is_clamped(self):
+        for i in range(4):
+            make_lead(student_name=f'Asha {i}')
+        self.assertEqual(len(self.search(q='asha', limit=2)), 2)
+        self.assertEqual(len(self.search(q='asha', limit=0)), 1)
+        self.assertEqual(len(self.search(q='asha', limit='many')), 4)
+        with mock.patch('crm_app.views.LeadSearchView.max_limit', 3):
+            self.assertEqual(len(self.search(q='asha', limit=100)), 3)
+
+    def test_converted_leads_are_not_found(self):
+        open_lead = make_lead(student_name='Asha')
+        make_lead(student_name='Asha', status=Lead.StatusChoices.CONVERTED)
+        self.assertEqual(self.search(q='asha'), [open_lead.pk])
+
+
+class LeadImportTests(TestCase):
+    HEADER = 'parents_name,student_name,email,phone_number,whatsapp_number,age,grade,source,class_type,status\n'
+
+    def setUp(self):
+        self.user = User.objects.create_user('rep', role=User.Roles.SALES_REP)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def row(self, student_name, phone='9800000000', status='New'):
+        return f'Parent,{student_name},parent@example.com,{phone},{phone},10,5,Website,Online,{status}\n'
+
+    def test_good_rows_are_imported_and_bad_rows_reported_by_line(self):
+        upload = SimpleUploadedFile('leads.csv', (
+            self.HEADER
+            + self.row('Asha')                                    # line 2
+            + self.row('Bikash', status='Maybe')                  # line 3
+            + self.row('')                                        # line 4
+            + self.row('Chandra', status='Converted')             # line 5
+            + self.row('Dipa', phone='')                          # line 6
+        ).encode())
+        response = self.client.post('/api/leads/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['failed']), (5, 2, 3))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4, 6])
+        self.assertIn('status', report['errors'][0]['errors'])
+        self.assertIn('student_name', report['errors'][1]['errors'])
+        self.assertIn('phone_number', report['errors'][2]['errors'])
+        self.assertFalse(report['errors_truncated'])
+
+        self.assertEqual(sorted(Lead.objects.values_list('student_name', flat=True)), ['Asha', 'Chandra'])
+        self.assertEqual(set(Lead.objects.values_list('created_by', flat=True)), {self.user.pk})
+        self.assertTrue(Enrollment.objects.filter(lead__student_name='Chandra').exists())
+
+    def test_duplicates_within_the_file_are_reported(self):
+        rows = [
+            json.dumps({'parents_name': 'Parent', 'student_name': name, 'email': 'parent@example.com',
+                        'phone_number': phone, 'whatsapp_number': phone, 'age': '10', 'grade': '5',
+                        'source': 'Website', 'class_type': 'Online'})
+            for name, phone in [('Asha', '9800000000'), ('Bikash', '9800000000'), ('asha ', '980-000-0000')]
+        ]
+        lines = [f'{row}\n'.encode() for row in [rows[0], '{not json', rows[1], '[1, 2]', rows[2], rows[0]]]
+        # Batches of two: duplicates are caught across batches too
+        report = LeadImporter(batch_size=2).run(lines, 'jsonl')
+        self.assertEqual((report['rows'], report['created'], report['failed']), (6, 2, 4))
+        self.assertEqual(report['errors'], [
+            {'line': 2, 'errors': {'non_field_errors': [mock.ANY]}},
+            {'line': 4, 'errors': {'non_field_errors': ['Expected a JSON object.']}},
+            {'line': 5, 'errors': {'non_field_errors': ['Duplicate of line 1.']}},
+            {'line': 6, 'errors': {'non_field_errors': ['Duplicate of line 1.']}},
+        ])
+        self.assertTrue(report['errors'][0]['errors']['non_field_errors'][0].startswith('Invalid JSON'))
+        self.assertEqual(sorted(Lead.objects.values_list('student_name', flat=True)), ['Asha', 'Bikash'])
+
+
+def rollup_counts():
+    """LeadDailyStat as {bucket: count}, to compare with lead_bucket_counts(Lead.objects.all())."""
+    return {
+        tuple(getattr(stat, name) for name in STAT_FIELDS): stat.count
+        for stat in LeadDailyStat.objects.filter(count__gt=0)
+    }
+
+
+class LeadBulkUpdateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+        self.course = Course.objects.create(course_name='Python')
+
+    def bulk_update(self, data):
+        return self.client.patch('/api/leads/bulk/', data, format='json')
+
+    def assertRollupsMatch(self):
+        self.assertEqual(rollup_counts(), dict(lead_bucket_counts(Lead.objects.all())))
+
+    def test_update_by_ids(self):
+        first, second, untouched = make_lead(), make_lead(), make_lead()
+        response = self.bulk_update({'ids': [first.pk, second.pk], 'update': {'next_call': '2025-03-01'}})
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(
+            set(Lead.objects.filter(next_call='2025-03-01').values_list('id', flat=True)), {first.pk, second.pk},
+        )
+        untouched.refresh_from_db()
+        self.assertIsNone(untouched.next_call)
+
+    def test_filter_selection_is_walked_in_batches(self):
+        leads = [make_lead(status='New') for _ in range(5)]
+        make_lead(status='Open')
+        # The update moves each batch out of the filter it was selected by
+        updated = bulk_update_leads({'filter': {'status': ['New']}}, {'status': 'Lost'}, batch_size=2)
+        self.assertEqual(updated, 5)
+        self.assertEqual(
+            set(Lead.objects.filter(status='Lost').values_list('id', flat=True)), {lead.pk for lead in leads},
+        )
+
+    def test_only_whitelisted_fields_and_a_selection_are_accepted(self):
+        lead = make_lead()
+        for data in [
+            {'update': {'status': 'Lost'}},
+            {'ids': [lead.pk], 'update': {'remarks': 'x'}},
+            {'ids': [lead.pk], 'update': {'status': 'Nope'}},
+            {'filter': {'status': 'Nope'}, 'update': {'status': 'Lost'}},
+            {'filter': {}, 'update': {'status': 'Lost'}},
+        ]:
+            self.assertEqual(self.bulk_update(data).status_code, 400, data)
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, 'New')
+
+    def test_conversion_rollups_and_outbox(self):
+        with_course = make_lead(status='New', course=self.course)
+        enrolled = make_lead(status='Open')
+        Enrollment.objects.create(lead=enrolled)
+        converted = make_lead(status='Converted')
+        self.assertRollupsMatch()
+
+        response = self.bulk_update({
+            'filter': {'status': ['New', 'Open', 'Converted']}, 'update': {'status': 'Converted'},
+        })
+        self.assertEqual(response.json(), {'updated': 3})
+        # One enrollment per lead: the existing one is kept
+        self.assertEqual(Enrollment.objects.filter(lead=enrolled).count(), 1)
+        self.assertEqual(Enrollment.objects.count(), 3)
+        self.assertEqual(Enrollment.objects.get(lead=with_course).course, self.course)
+        self.assertRollupsMatch()
+
+        # Leads already Converted didn't change status, so they get no events
+        events = OutboxEvent.objects.order_by('id').values_list('event_type', 'payload__lead__id')
+        self.assertEqual(list(events), [
+            ('lead.status_changed', with_course.pk), ('lead.converted', with_course.pk),
+            ('lead.status_changed', enrolled.pk), ('lead.converted', enrolled.pk),
+        ])
+        self.assertNotIn(converted.pk, [lead_id for _, lead_id in events])
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates crm_app back to ``migrate_from`` for the test; self.migrate(name) moves it, returning the historical apps."""
+    migrate_from = None
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('crm_app', target)])
+        return executor.loader.project_state([('crm_app', target)]).apps
+
+    def setUp(self):
+        self.addCleanup(call_command, 'migrate', 'crm_app', verbosity=0)
+        self.apps = self.migrate(self.migrate_from)
+
+
+class LeadRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+        self.course = Course.objects.create(course_name='Python')
+
+    def assertRollupsMatch(self):
+        self.assertEqual(rollup_counts(), dict(lead_bucket_counts(Lead.objects.all())))
+
+    def test_create_update_and_delete(self):
+        lead = make_lead(course=self.course)
+        response = self.client.post('/api/leads/', {
+            'parents_name': 'Parent', 'student_name': 'Asha', 'email': 'parent@example.com',
+            'phone_number': '9800000000', 'whatsapp_number': '9800000000', 'age': '10', 'grade': '5',
+            'source': 'Website', 'class_type': 'Online',
+        }, format='json')
+        self.assertRollupsMatch()
+
+        self.client.patch(f'/api/leads/{lead.pk}/', {'status': 'Converted'}, format='json')
+        self.client.patch(f"/api/leads/{response.json()['id']}/", {'remarks': 'called'}, format='json')
+        self.assertRollupsMatch()
+
+        self.client.delete(f'/api/leads/{lead.pk}/')
+        self.assertRollupsMatch()
+
+    def test_writes_lock_the_lead(self):
+        lead = make_lead()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(f'/api/leads/{lead.pk}/', {'status': 'Lost'}, format='json')
+        fetch = next(query['sql'] for query in ctx.captured_queries if query['sql'].startswith('SELECT'))
+        self.assertIn('FOR UPDATE', fetch)
+
+    def test_bulk_update_import_and_course_delete(self):
+        leads = [make_lead(), make_lead(course=self.course), make_lead(status='Open')]
+        other = Course.objects.create(course_name='Go')
+        self.client.patch('/api/leads/bulk/', {
+            'ids': [lead.pk for lead in leads[:2]], 'update': {'status': 'Lost', 'course': other.pk},
+        }, format='json')
+        self.assertRollupsMatch()
+
+        rows = b'\n'.join(
+            json.dumps({
+                'parents_name': 'Parent', 'student_name': name, 'email': 'parent@example.com',
+                'phone_number': '1', 'whatsapp_number': '1', 'age': '10', 'grade': '5',
+                'source': 'Website', 'class_type': 'Online', 'status': status,
+            }).encode()
+            for name, status in [('Asha', 'Converted'), ('Bikash', 'New')]
+        )
+        response = self.client.post(
+            '/api/leads/import/', {'file': SimpleUploadedFile('leads.jsonl', rows)}, format='multipart',
+        )
+        self.assertEqual(response.json()['created'], 2)
+        self.assertRollupsMatch()
+
+        other.delete()
+        self.assertRollupsMatch()
+
+
+class LeadConversionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+
+    def test_converting_twice_keeps_one_enrollment(self):
+        lead = make_lead(status='Converted')
+        convert_leads([lead])
+        enrollment = Enrollment.objects.get(lead=lead)
+        Enrollment.objects.filter(pk=enrollment.pk).update(total_payment=500)
+        convert_leads([lead])
+        self.assertEqual(list(Enrollment.objects.filter(lead=lead).values_list('id', 'total_payment')), [
+            (enrollment.pk, 500),
+        ])
+
+    def test_bulk_conversion_skips_existing_enrollments(self):
+        enrolled = make_lead(status='Converted')
+        Enrollment.objects.create(lead=enrolled)
+        fresh = [make_lead(status='Converted') for _ in range(2)]
+        convert_leads([enrolled, *fresh, fresh[0]])
+        self.assertEqual(
+            sorted(Enrollment.objects.values_list('lead_id', flat=True)), sorted([enrolled.pk, *[lead.pk for lead in fresh]]),
+        )
+
+    def test_enrollment_serializer_rejects_a_second_enrollment(self):
+        lead = make_lead(status='Converted')
+        enrollment = Enrollment.objects.create(lead=lead)
+        serializer = EnrollmentSerializer(data={'lead': lead.pk})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['lead'], ['This lead is already enrolled.'])
+
+        other = Enrollment.objects.create(lead=make_lead(status='Converted'))
+        self.assertEqual(self.client.patch(f'/api/enrollments/{other.pk}/', {'lead': lead.pk}, format='json').status_code, 400)
+        self.assertEqual(
+            self.client.patch(f'/api/enrollments/{enrollment.pk}/', {'lead': lead.pk}, format='json').status_code, 200,
+        )
+
+
+class UniqueEnrollmentMigrationTests(MigrationTestCase):
+    migrate_from = '0012_lead_search'
+
+    def test_duplicate_enrollments_are_removed(self):
+        Lead = self.apps.get_model('crm_app', 'Lead')
+        Enrollment = self.apps.get_model('crm_app', 'Enrollment')
+        paid_lead, unpaid_lead = make_lead(model=Lead), make_lead(model=Lead)
+        Enrollment.objects.create(lead=paid_lead)
+        paid = Enrollment.objects.create(lead=paid_lead, total_payment=300)
+        oldest = Enrollment.objects.create(lead=unpaid_lead)
+        Enrollment.objects.create(lead=unpaid_lead)
+
+        Enrollment = self.migrate('0013_unique_enrollment_per_lead').get_model('crm_app', 'Enrollment')
+        self.assertEqual(sorted(Enrollment.objects.values_list('id', flat=True)), sorted([paid.pk, oldest.pk]))
+
+
+class CourseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+        self.course = Course.objects.create(course_name='Python')
+
+    def test_list_is_served_from_cache_with_validators(self):
+        self.client.get('/api/courses/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.json(), [{'id': self.course.pk, 'course_name': 'Python'}])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        detail = self.client.get(f'/api/courses/{self.course.pk}/')
+        not_modified = self.client.get(f'/api/courses/{self.course.pk}/', HTTP_IF_MODIFIED_SINCE=detail['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_invalidate_on_commit(self):
+        etag = self.client.get('/api/courses/')['ETag']
+        self.client.get(f'/api/courses/{self.course.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/courses/{self.course.pk}/', {'course_name': 'Go'}, format='json')
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['course_name'], 'Go')
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.pk}/').json()['course_name'], 'Go')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/courses/{self.course.pk}/')
+        self.assertEqual(self.client.get('/api/courses/').json(), [])
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.pk}/').status_code, 404)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get('/api/courses/')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Course.objects.create(course_name='Go')
+        self.assertEqual(len(self.client.get('/api/courses/').json()), 1)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_lead_choices_not_modified(self):
+        response = self.client.get('/api/leads/choices/')
+        self.assertIn({'value': 'New', 'label': 'New'}, response.json()['status'])
+        self.assertEqual(self.client.get('/api/leads/choices/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class RevenueReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.this_month = month_start(timezone.localdate())
+        self.last_month = month_start(self.this_month - datetime.timedelta(days=1))
+        self.two_months_ago = month_start(self.last_month - datetime.timedelta(days=1))
+        self.python = Course.objects.create(course_name='Python')
+        self.scratch = Course.objects.create(course_name='Scratch')
+
+    def enroll(self, month, course, total, paid=None, **kwargs):
+        # created_at is auto_now_add
+        with mock.patch('django.utils.timezone.now', return_value=as_datetime(month + datetime.timedelta(days=1))):
+            enrollment = Enrollment.objects.create(course=course, total_payment=total, **kwargs)
+        if paid:
+            Payment.objects.create(enrollment=enrollment, amount=paid, paid_on=timezone.localdate())
+        return enrollment
+
+    def report(self, start, end):
+        fields = ['month', 'course', 'payment_completed', 'enrollments', 'total', 'collected', 'outstanding']
+        return [tuple(row[name] for name in fields) for row in revenue_report(start, end)]
+
+    def test_totals_per_month_course_and_completion(self):
+        self.enroll(self.two_months_ago, self.python, 200)
+        self.enroll(self.last_month, self.python, 1000, paid=400)
+        self.enroll(self.last_month, self.python, 500, paid=500, payment_completed=True)
+        self.enroll(self.last_month, self.scratch, 300)
+        self.enroll(self.last_month, None, 100)
+        two_months_ago, last_month = self.two_months_ago.isoformat(), self.last_month.isoformat()
+        self.assertEqual(self.report(self.two_months_ago, self.last_month), [
+            (two_months_ago, self.python.pk, False, 1, '200.00', '0.00', '200.00'),
+            (last_month, self.python.pk, False, 1, '1000.00', '400.00', '600.00'),
+            (last_month, self.python.pk, True, 1, '500.00', '500.00', '0.00'),
+            (last_month, self.scratch.pk, False, 1, '300.00', '0.00', '300.00'),
+            (last_month, None, False, 1, '100.00', '0.00', '100.00'),
+        ])
+
+    def test_cached_months_are_reused(self):
+        self.enroll(self.last_month, self.python, 1000)
+        first = revenue_report(self.two_months_ago, self.last_month)
+        with self.assertNumQueries(0):
+            self.assertEqual(revenue_report(self.two_months_ago, self.last_month), first)
+        # A longer range only computes the months it adds
+        earlier = month_start(self.two_months_ago - datetime.timedelta(days=1))
+        with CaptureQueriesContext(connection) as ctx:
+            revenue_report(earlier, self.last_month)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn(f"'{as_datetime(next_month(earlier)).isoformat()}'", ctx.captured_queries[0]['sql'])
+
+    def assertChangeDropsOnlyItsMonth(self, change):
+        revenue_report(self.two_months_ago, self.last_month)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertIsNone(cache.get(month_key(self.last_month)))
+        self.assertIsNotNone(cache.get(month_key(self.two_months_ago)))
+
+    def test_changes_drop_only_their_month(self):
+        enrollment = self.enroll(self.last_month, self.python, 1000)
+        self.enroll(self.two_months_ago, self.python, 200)
+
+        self.assertChangeDropsOnlyItsMonth(lambda: self.enroll(self.last_month, self.scratch, 300))
+        payment = Payment(enrollment=enrollment, amount=100, paid_on=timezone.localdate())
+        self.assertChangeDropsOnlyItsMonth(payment.save)
+        payment.amount = 150
+        self.assertChangeDropsOnlyItsMonth(payment.save)
+        self.assertChangeDropsOnlyItsMonth(payment.delete)
+        enrollment.total_payment = 1200
+        self.assertChangeDropsOnlyItsMonth(enrollment.save)
+        self.assertChangeDropsOnlyItsMonth(enrollment.delete)
+        self.assertEqual(
+            [row[3:5] for row in self.report(self.last_month, self.last_month)], [(1, '300.00')],
+        )
+
+    def test_current_month_is_never_cached(self):
+        self.enroll(self.last_month, self.python, 1000)
+        enrollment = Enrollment.objects.create(course=self.python, total_payment=100)
+        self.assertEqual([row[4] for row in self.report(self.last_month, self.this_month)], ['1000.00', '100.00'])
+        self.assertIsNotNone(cache.get(month_key(self.last_month)))
+        self.assertIsNone(cache.get(month_key(self.this_month)))
+
+        # Even a change that bypasses the signals shows up
+        Enrollment.objects.filter(pk=enrollment.pk).update(total_payment=250)
+        self.assertEqual([row[4] for row in self.report(self.last_month, self.this_month)], ['1000.00', '250.00'])
+
+
+class PaymentLedgerTests(TestCase):
+    def setUp(self):
+        self.enrollment = Enrollment.objects.create(lead=make_lead(status='Converted'), total_payment='300.00')
+
+    def pay(self, amount, paid_on):
+        return Payment.objects.create(enrollment=self.enrollment, amount=amount, paid_on=paid_on)
+
+    def balances(self):
+        self.enrollment.refresh_from_db()
+        return self.enrollment.amount_paid, self.enrollment.balance, self.enrollment.last_pay_date
+
+    def test_payments_maintain_the_balance(self):
+        self.assertEqual(self.balances(), (0, 300, None))
+        first = self.pay(100, datetime.date(2025, 1, 5))
+        self.pay(50, datetime.date(2025, 2, 5))
+        self.assertEqual(self.balances(), (150, 150, datetime.date(2025, 2, 5)))
+        first.delete()
+        self.assertEqual(self.balances(), (50, 250, datetime.date(2025, 2, 5)))
+
+    def test_saving_only_recomputes_when_the_total_changes(self):
+        with self.assertNumQueries(1):
+            self.enrollment.payment_completed = True
+            self.enrollment.save()
+        self.enrollment.total_payment = Decimal('250.00')
+        self.enrollment.save()
+        self.assertEqual(self.enrollment.balance, 250)
+
+    def test_stale_instance_does_not_undo_a_payment(self):
+        stale = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.pay(100, datetime.date(2025, 1, 5))
+        stale.total_payment = Decimal('400.00')
+        stale.save()
+        self.assertEqual(self.balances(), (100, 300, datetime.date(2025, 1, 5)))
+
+    def test_enrollments_without_payments_keep_their_last_pay_date(self):
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(last_pay_date=datetime.date(2024, 6, 1))
+        Enrollment.objects.filter(pk=self.enrollment.pk).refresh_balances()
+        self.assertEqual(self.balances(), (0, 300, datetime.date(2024, 6, 1)))
+
+
+class PaymentLedgerMigrationTests(MigrationTestCase):
+    migrate_from = '0014_lead_daily_stat'
+
+    def test_installments_become_payments(self):
+        Lead = self.apps.get_model('crm_app', 'Lead')
+        Enrollment = self.apps.get_model('crm_app', 'Enrollment')
+        paid = Enrollment.objects.create(
+            lead=make_lead(model=Lead), total_payment=500, first_installment=200, second_installment=100,
+            last_pay_date=datetime.date(2024, 3, 1),
+        ).pk
+        unpaid = Enrollment.objects.create(
+            lead=make_lead(model=Lead), total_payment=400, last_pay_date=datetime.date(2024, 4, 1),
+        ).pk
+
+        apps = self.migrate('0015_payment_ledger')
+        Enrollment = apps.get_model('crm_app', 'Enrollment')
+        Payment = apps.get_model('crm_app', 'Payment')
+        self.assertEqual(
+            sorted(Payment.objects.filter(enrollment_id=paid).values_list('amount', 'paid_on')),
+            [(100, datetime.date(2024, 3, 1)), (200, datetime.date(2024, 3, 1))],
+        )
+        self.assertFalse(Payment.objects.filter(enrollment_id=unpaid).exists())
+        balances = dict(Enrollment.objects.values_list('id', 'balance'))
+        self.assertEqual(balances, {paid: 200, unpaid: 400})
+        self.assertEqual(Enrollment.objects.get(pk=unpaid).last_pay_date, datetime.date(2024, 4, 1))
+
+
+class CallQueueTests(TestCase):
+    def setUp(self):
+        self.rep = User.objects.create_user('rep', role=User.Roles.SALES_REP)
+        self.client = APIClient()
+        self.client.force_authenticate(self.rep)
+        self.today = timezone.localdate()
+
+    def days(self, count):
+        return self.today + datetime.timedelta(days=count)
+
+    def queue(self, **params):
+        response = self.client.get('/api/leads/call-queue/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()]
+
+    def test_due_and_overdue_calls_most_overdue_first(self):
+        due = make_lead(created_by=self.rep, next_call=self.today)
+        overdue = make_lead(created_by=self.rep, next_call=self.days(-3))
+        also_due = make_lead(created_by=self.rep, next_call=self.today)
+        tomorrow = make_lead(created_by=self.rep, next_call=self.days(1))
+        make_lead(created_by=self.rep)
+        for closed in [Lead.StatusChoices.CONVERTED, Lead.StatusChoices.LOST, Lead.StatusChoices.JUNK]:
+            make_lead(created_by=self.rep, next_call=self.days(-1), status=closed)
+        make_lead(created_by=User.objects.create_user('other', role=User.Roles.SALES_REP), next_call=self.today)
+
+        self.assertEqual(self.queue(), [overdue.pk, due.pk, also_due.pk])
+        self.assertEqual(self.queue(date=self.days(1).isoformat()), [overdue.pk, due.pk, also_due.pk, tomorrow.pk])
+        self.assertEqual(self.queue(limit=1), [overdue.pk])
+        self.assertEqual(self.client.get('/api/leads/call-queue/', {'date': 'tomorrow'}).status_code, 400)
+
+    def test_log_call_updates_the_lead_in_one_statement(self):
+        lead = make_lead(created_by=self.rep, next_call=self.days(-1), remarks='Asked for fees')
+        following = make_lead(created_by=self.rep, next_call=self.today)
+        data = {'next_call': self.days(7).isoformat(), 'remarks': 'Call back after exams'}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/leads/{lead.pk}/log-call/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['lead'], {'id': lead.pk, 'last_call': self.today.isoformat(), **data})
+        self.assertEqual(response.json()['next']['id'], following.pk)
+        self.assertEqual([query['sql'].split()[0] for query in ctx.captured_queries].count('UPDATE'), 1)
+
+        lead.refresh_from_db()
+        self.assertEqual((lead.last_call, lead.next_call, lead.remarks), (self.today, self.days(7), data['remarks']))
+        self.assertEqual(self.queue(), [following.pk])
+
+        # Without remarks they are kept; null takes the lead out of the queue
+        response = self.client.post(f'/api/leads/{following.pk}/log-call/', {'next_call': None}, format='json')
+        self.assertIsNone(response.json()['next'])
+        following.refresh_from_db()
+        self.assertEqual((following.last_call, following.next_call, following.remarks), (self.today, None, ''))
+
+    def test_log_call_rejects_invalid_input(self):
+        lead = make_lead(created_by=self.rep, next_call=self.today, remarks='Asked for fees')
+        url = f'/api/leads/{lead.pk}/log-call/'
+        invalid = [{}, {'next_call': 'soon'}, {'next_call': self.today.isoformat()}, {'next_call': self.days(-1).isoformat()}]
+        for data in invalid:
+            response = self.client.post(url, data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+            self.assertIn('next_call', response.json())
+        lead.refresh_from_db()
+        self.assertEqual((lead.last_call, lead.next_call, lead.remarks), (None, self.today, 'Asked for fees'))
+
+        response = self.client.post('/api/leads/0/log-call/', {'next_call': None}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class FastListRenderingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+        course = Course.objects.create(course_name='Python')
+        Enrollment.objects.create(lead=make_lead(status='Converted', course=course), course=course, total_payment='12.5')
+        Enrollment.objects.create(lead=make_lead(status='Converted'), total_payment='10')
+        Enrollment.objects.create(course=course)
+        Enrollment.objects.create()
+
+    def assertSameAsSerializer(self, url):
+        fast = self.client.get(url, HTTP_ACCEPT='application/json').content
+        with override_settings(FAST_LIST_RENDERING=False):
+            slow = self.client.get(url, HTTP_ACCEPT='application/json').content
+        self.assertEqual(fast, slow, url)
+
+    def test_enrollments_with_null_relations(self):
+        for url in ['/api/enrollments/', '/api/enrollments/?page_size=2', '/api/leads/', '/api/leads/?fields=id,course']:
+            self.assertSameAsSerializer(url)
+        bare = next(row for row in self.client.get('/api/enrollments/').json() if row['lead'] is None and row['course'] is None)
+        self.assertNotIn('student_name', bare)
+        self.assertNotIn('course_name', bare)
+
+    def test_field_defaults_apply_to_null_relations(self):
+        make_lead(next_call=timezone.localdate())
+        serializer = CallQueueSerializer(Lead.objects.select_related('course'), many=True)
+        builder = RowBuilder.for_serializer(CallQueueSerializer())
+        self.assertEqual(builder.build(builder.values(Lead.objects.all())), serializer.data)
+
+
+class JWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('boss', password='secret-pass', role=User.Roles.ADMIN)
+        self.client = APIClient()
+
+    def authenticate(self):
+        response = APIClient().post('/api/auth/token/', {'username': 'boss', 'password': 'secret-pass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        return response.json()['access']
+
+    def get_status(self):
+        return self.client.get('/api/leads/').status_code
+
+    def test_issue_and_verify(self):
+        bad = self.client.post('/api/auth/token/', {'username': 'boss', 'password': 'wrong'}, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+        token = self.authenticate()
+        user, claims = decode_token(token)
+        self.assertEqual((user.pk, user.role, claims['ver']), (self.user.pk, 'admin', 0))
+        self.assertEqual(self.get_status(), 200)
+        # Revocation state is cached: the report query is the only one
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/analytics/leads/').status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token[:-2]}xx')
+        self.assertEqual(self.get_status(), 403)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer')
+        self.assertEqual(self.get_status(), 403)
+
+    @override_settings(JWT_ACCESS_TTL=-1)
+    def test_expired_token(self):
+        token, _ = issue_token(self.user)
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has expired.'):
+            decode_token(token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.get_status(), 403)
+
+    def assertRevokedBy(self, change):
+        self.authenticate()
+        self.assertEqual(self.get_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(self.client.get('/api/leads/').json()['detail'], 'Token has been revoked.')
+
+    def test_role_change_revokes(self):
+        def demote():
+            self.user.role = User.Roles.SALES_REP
+            self.user.save()
+        self.assertRevokedBy(demote)
+
+    def test_deactivation_revokes(self):
+        def deactivate():
+            self.user.is_active = False
+            self.user.save()
+        self.assertRevokedBy(deactivate)
+
+    def test_password_change_revokes(self):
+        def change_password():
+            self.user.set_password('another-pass')
+            self.user.save()
+        self.assertRevokedBy(change_password)
+
+    def test_revoke_endpoint_revokes(self):
+        self.assertRevokedBy(lambda: self.assertEqual(self.client.post('/api/auth/token/revoke/').status_code, 204))
+
+    def test_cache_is_invalidated_on_commit(self):
+        self.authenticate()
+        self.get_status()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.role = User.Roles.SALES_REP
+            self.user.save()
+            # Until commit the cached state stands, so no request re-caches the old row
+            self.assertEqual(self.get_status(), 200)
+        self.assertEqual(self.get_status(), 200)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get_status(), 403)
+
+
+class AsyncListViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('boss', role=User.Roles.ADMIN)
+        token, _ = issue_token(user)
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        course = Course.objects.create(course_name='Python')
+        for i in range(4):
+            make_lead(student_name=f'Student {i}', course=course if i % 2 else None,
+                      next_call=datetime.date(2025, 1, i + 1) if i % 2 else None)
+        Enrollment.objects.create(lead=make_lead(status='Converted', course=course), course=course, total_payment=10)
+        Enrollment.objects.create()
+
+    async def get_both(self, path, **headers):
+        async_response = await self.async_client.get(f'/api/async/{path}', headers={**self.headers, **headers})
+        sync_response = await sync_to_async(self.client.get)(
+            f'/api/{path}', HTTP_ACCEPT='application/json', **{f"HTTP_{name.upper().replace('-', '_')}": value
+                                                               for name, value in headers.items()},
+        )
+        return async_response, sync_response
+
+    async def test_responses_match_the_sync_views(self):
+        for path in ['leads/', 'leads/?page_size=2&ordering=next_call', 'leads/?status=Bogus',
+                     'leads/?cursor=zz&page_size=1', 'leads/?fields=id,course,next_call&page_size=2&ordering=next_call',
+                     'leads/?fields=id,bogus', 'enrollments/', 'enrollments/?outstanding=true', 'courses/']:
+            async_response, sync_response = await self.get_both(path)
+            self.assertEqual(async_response.status_code, sync_response.status_code, path)
+            self.assertEqual(async_response.content.replace(b'/api/async/', b'/api/'), sync_response.content, path)
+            if sync_response.status_code == 200:
+                self.assertEqual(async_response['ETag'], sync_response['ETag'], path)
+
+        async_response, _ = await self.get_both('leads/?fields=id,course,next_call&page_size=2&ordering=next_call')
+        self.assertEqual(set(async_response.json()['results'][0]), {'id', 'course', 'next_call'})
+
+    async def test_not_modified(self):
+        for path in ['leads/?status=New', 'enrollments/', 'courses/']:
+            etag = (await self.async_client.get(f'/api/async/{path}', headers=self.headers))['ETag']
+            async_response, sync_response = await self.get_both(path, **{'If-None-Match': etag})
+            self.assertEqual((async_response.status_code, sync_response.status_code), (304, 304), path)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'leads': '1/min'}})
+    async def test_throttled(self):
+        # Admins get twice the base rate
+        for _ in range(2):
+            self.assertEqual((await self.async_client.get('/api/async/leads/', headers=self.headers)).status_code, 200)
+        response = await self.async_client.get('/api/async/leads/', headers=self.headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    async def test_requires_authentication(self):
+        self.assertEqual((await self.async_client.get('/api/async/leads/')).status_code, 403)
+        response = await self.async_client.get('/api/async/leads/', headers={'Authorization': 'Bearer x'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('rep', role=User.Roles.SALES_REP))
+        self.lead = make_lead()
+
+    def test_detail_not_modified_and_if_match(self):
+        url = f'/api/leads/{self.lead.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.patch(url, {'remarks': 'first'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url)['ETag'], response['ETag'])
+
+        # A second client still holding the old ETag
+        response = self.client.patch(url, {'remarks': 'second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.lead.refresh_from_db()
+        self.assertEqual(self.lead.remarks, 'first')
+
+    def test_sparse_detail_has_its_own_etag(self):
+        url = f'/api/leads/{self.lead.pk}/'
+        etag = self.client.get(url)['ETag']
+        sparse = self.client.get(f'{url}?fields=id,status')
+        self.assertEqual(set(sparse.json()), {'id', 'status'})
+        self.assertNotEqual(sparse['ETag'], etag)
+        self.assertEqual(self.client.get(f'{url}?fields=id,status', HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 304)
+        # The full representation isn't served as "not modified" to a sparse cache entry
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(f'{url}?fields=id', HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 200)
+
+    def test_list_etag_follows_changes(self):
+        etag = self.client.get('/api/leads/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/leads/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/leads/?status=New')['ETag'], etag)
+
+        self.lead.delete()
+        self.assertEqual(self.client.get('/api/leads/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_enrollment_etag_changes_with_payments(self):
+        enrollment = Enrollment.objects.create(lead=self.lead, total_payment=100)
+        url = f'/api/enrollments/{enrollment.pk}/'
+        etag = self.client.get(url)['ETag']
+        Payment.objects.create(enrollment=enrollment, amount=40, paid_on='2024-01-10')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0, SYNC_PAGE_SIZE=2)
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('rep', role=User.Roles.SALES_REP))
+
+    def sync(self, url):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            url = data['next']
+        return pages
+
+    def test_pages_through_changes_and_reports_deletions(self):
+        leads = [make_lead(student_name=f'Student {i}') for i in range(3)]
+        Enrollment.objects.create(lead=leads[2])
+        pages = self.sync('/api/leads/sync/')
+        self.assertEqual([len(page['changed']) for page in pages], [2, 1])
+        cursor = pages[-1]['cursor']
+
+        self.client.patch(f'/api/leads/{leads[0].pk}/', {'remarks': 'called'}, format='json')
+        self.client.delete(f'/api/leads/{leads[2].pk}/')
+        pages = self.sync(f'/api/leads/sync/?cursor={cursor}')
+        self.assertEqual([row['id'] for row in pages[0]['changed']], [leads[0].pk])
+        self.assertEqual(pages[0]['deleted'], [leads[2].pk])
+        self.assertFalse(pages[0]['has_more'])
+
+        # The enrollment went with its lead
+        pages = self.sync(f'/api/enrollments/sync/?since={timezone.now().date().isoformat()}')
+        self.assertEqual(pages[0]['changed'], [])
+        self.assertEqual(len(pages[0]['deleted']), 1)
+
+    def test_old_since_needs_a_full_sync(self):
+        self.assertEqual(self.client.get('/api/leads/sync/?since=2000-01-01T00:00:00Z').status_code, 410)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('rep', role=User.Roles.SALES_REP)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def run_worker(self):
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+    def test_background_export(self):
+        make_lead(student_name='Asha', status='New')
+        make_lead(student_name='Bikash', status='Lost')
+        response = self.client.get('/api/leads/export/?background=true&status=New')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+
+        self.run_worker()
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['result']['rows']), ('succeeded', 1))
+        download = self.client.get(job['download_url'])
+        self.assertIn(b'Asha', b''.join(download.streaming_content))
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', role=User.Roles.SALES_REP))
+        self.assertEqual(other.get(response['Location']).status_code, 404)
+
+    def test_background_bulk_update(self):
+        lead = make_lead(status='New')
+        response = self.client.patch(
+            '/api/leads/bulk/?background=true', {'ids': [lead.pk], 'update': {'status': 'Lost'}}, format='json',
+        )
+        self.assertEqual(response.status_code, 202)
+        self.run_worker()
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, 'Lost')
+        self.assertEqual(Job.objects.get().result, {'updated': 1})
+
+    def test_invalid_bulk_update_fails_without_retrying(self):
+        lead = make_lead(status='New')
+        course = Course.objects.create(course_name='Retired')
+        self.client.patch(
+            '/api/leads/bulk/?background=true', {'ids': [lead.pk], 'update': {'course': course.pk}}, format='json',
+        )
+        course.delete()
+        with self.assertLogs('crm_app.jobs', 'WARNING'):
+            self.run_worker()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.StatusChoices.FAILED, 1))
+        self.assertIn('course', job.result['errors']['update'])
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').json()['error'], 'The update is no longer valid.')
+
+    @override_settings(JOB_RETRY_DELAY=0)
+    def test_failed_jobs_are_retried_then_marked_failed(self):
+        calls = []
+
+        def flaky(job):
+            calls.append(job.attempts)
+            raise RuntimeError('mail server down')
+
+        with mock.patch.dict(TASKS, {'flaky': flaky}):
+            job = enqueue('flaky', user=self.user, max_attempts=2)
+            with self.assertLogs('crm_app.jobs', 'ERROR'):
+                run_pending()
+        job.refresh_from_db()
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual((job.status, job.attempts), (Job.StatusChoices.FAILED, 2))
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').json()['error'], 'RuntimeError: mail server down')
+
+
+class WorkerCommandTests(SimpleTestCase):
+    def test_stop_finishes_the_current_batch(self):
+        class Worker(WorkerCommand):
+            poll_seconds_setting = 'JOB_POLL_SECONDS'
+            batches = 0
+
+            def work(self):
+                self.batches += 1
+                if self.batches == 2:
+                    # SIGTERM mid-batch
+                    self.stop(signal.SIGTERM, None)
+                return self.batches < 3
+
+        worker = Worker()
+        with mock.patch('signal.signal') as install, mock.patch('time.sleep') as sleep:
+            worker.handle(once=False)
+        self.assertEqual(worker.batches, 2)
+        self.assertEqual({call.args[0] for call in install.call_args_list}, {signal.SIGTERM, signal.SIGINT})
+        self.assertFalse(sleep.called)
+
+        worker = Worker()
+        with mock.patch('signal.signal') as install:
+            worker.handle(once=True)
+        # --once drains until a pass finds nothing, without signal handlers
+        self.assertEqual(worker.batches, 3)
+        self.assertFalse(install.called)
+
+
+class LeadWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', role=User.Roles.ADMIN))
+
+    def create_lead(self, **data):
+        data = {
+            'parents_name': 'Parent', 'student_name': 'Asha', 'email': 'parent@example.com',
+            'phone_number': '9800000000', 'whatsapp_number': '9800000000', 'age': '10', 'grade': '5',
+            'source': 'Facebook', 'class_type': 'Online', **data,
+        }
+        return self.client.post('/api/leads/', data, format='json').json()['id']
+
+    def dispatch(self):
+        with mock.patch('crm_app.webhooks.requests.post') as post:
+            call_command('dispatch_webhooks', '--once', stdout=StringIO())
+        return post
+
+    def test_lifecycle_events_are_written_with_the_change(self):
+        lead_id = self.create_lead(adset_name='spring-camp')
+        self.client.patch(f'/api/leads/{lead_id}/', {'remarks': 'called'}, format='json')
+        self.client.patch(f'/api/leads/{lead_id}/', {'status': 'Converted'}, format='json')
+
+        events = list(OutboxEvent.objects.order_by('id'))
+        self.assertEqual(
+            [event.event_type for event in events], ['lead.created', 'lead.status_changed', 'lead.converted'],
+        )
+        self.assertEqual(events[0].payload['lead']['adset_name'], 'spring-camp')
+        self.assertEqual(events[1].payload['previous_status'], 'New')
+
+    def test_dispatch_batches_signs_and_backs_off(self):
+        hook = Webhook.objects.create(url='https://hooks.example.com/crm', secret='s3cret', events=['lead.created'])
+        self.create_lead()
+        self.client.patch('/api/leads/bulk/', {'ids': [self.create_lead()], 'update': {'status': 'Lost'}}, format='json')
+
+        self.assertEqual(OutboxEvent.objects.filter(event_type='lead.status_changed').count(), 1)
+
+        with mock.patch('crm_app.webhooks.requests.post', side_effect=requests.ConnectionError('refused')), \
+                self.assertLogs('crm_app.webhooks', 'WARNING'):
+            call_command('dispatch_webhooks', '--once', stdout=StringIO())
+        hook.refresh_from_db()
+        self.assertEqual(hook.failures, 1)
+        self.assertGreater(hook.retry_after, timezone.now())
+        self.assertFalse(self.dispatch().called)
+
+        Webhook.objects.filter(pk=hook.pk).update(retry_after=timezone.now())
+        post = self.dispatch()
+        body = post.call_args.kwargs['data']
+        # Both creations in one request; the status change isn't subscribed to
+        self.assertEqual([event['type'] for event in json.loads(body)['events']], ['lead.created', 'lead.created'])
+        self.assertEqual(post.call_args.kwargs['headers']['X-CRM-Signature'], f"sha256={sign('s3cret', body)}")
+        self.assertEqual(
+            list(WebhookDelivery.objects.values_list('status', 'attempts')), [('delivered', 2), ('delivered', 2)],
+        )
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def route(self, request):
+        seen = {}
+
+        def view(request):
+            seen['db'] = ReplicaRouter().db_for_read(Lead)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen['db'], response
+
+    def test_safe_requests_read_from_replica(self):
+        db, response = self.route(RequestFactory().get('/api/leads/'))
+        self.assertEqual(db, 'replica1')
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        db, response = self.route(RequestFactory().post('/api/leads/'))
+        self.assertEqual(db, 'default')
+        request = RequestFactory().get('/api/leads/')
+        request.COOKIES[PRIMARY_COOKIE] = response.cookies[PRIMARY_COOKIE].value
+        db, _ = self.route(request)
+        self.assertEqual(db, 'default')
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Lead), 'default')
+
+    async def test_async_requests_stay_async(self):
+        seen = {}
+
+        def read(request):
+            seen['db'] = ReplicaRouter().db_for_read(Lead)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        async def view(request):
+            # Like a sync view adapted under ASGI: a thread inheriting the context
+            return await sync_to_async(read)(request)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(RequestFactory().get('/api/async/leads/'))
+        self.assertEqual(seen['db'], 'replica1')
+        response = await middleware(RequestFactory().post('/api/leads/'))
+        self.assertEqual(seen['db'], 'default')
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'Set DB_REPLICA_HOSTS to run against a replica.')
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica mirrors the test database, so it sees committed rows.
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pass', role=User.Roles.ADMIN))
+        self.replica = connections[settings.REPLICA_DATABASES[0]]
+
+    def test_list_reads_from_replica_until_the_client_writes(self):
+        make_lead(student_name='Existing')
+        with CaptureQueriesContext(self.replica) as ctx:
+            response = self.client.get('/api/leads/')
+        self.assertEqual([lead['student_name'] for lead in response.json()], ['Existing'])
+        self.assertTrue(ctx.captured_queries)
+
+        response = self.client.patch(f"/api/leads/{response.json()[0]['id']}/", {'city': 'Pokhara'}, format='json')
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        with CaptureQueriesContext(self.replica) as ctx:
+            response = self.client.get('/api/leads/')
+        self.assertEqual(response.json()[0]['city'], 'Pokhara')
+        self.assertFalse(ctx.captured_queries)
+
+    def test_cache_fills_read_from_the_primary(self):
+        cache.clear()
+        Course.objects.create(course_name='Python')
+        token, _ = issue_token(User.objects.get(username='admin'))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(self.replica) as ctx:
+            self.assertEqual(client.get('/api/courses/').status_code, 200)
+            self.assertEqual(client.get('/api/reports/revenue/').status_code, 200)
+            response = async_to_sync(self.async_client.get)(
+                '/api/async/courses/', headers={'Authorization': f'Bearer {token}'},
+            )
+            self.assertEqual(response.status_code, 200)
+        # Neither the revocation state nor the course list and report cache entries
+        tables = ' '.join(query['sql'] for query in ctx.captured_queries)
+        for table in ['crm_app_user', 'crm_app_course', 'crm_app_enrollment']:
+            self.assertNotIn(table, tables)
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'leads': '2/min', 'auth': '1/min'}})
+class RoleRateThrottleTests(SimpleTestCase):
+    # SimpleTestCase: any database query fails the test
+
+    def setUp(self):
+        cache.clear()
+
+    def hits(self, user, scope, count, ip='10.0.0.1'):
+        request = RequestFactory().get('/', REMOTE_ADDR=ip)
+        request.user = user
+        view = SimpleNamespace(throttle_scope=scope)
+        return [RoleRateThrottle().allow_request(request, view) for _ in range(count)]
+
+    def test_limit_scales_with_role(self):
+        rep = User(pk=1, role=User.Roles.SALES_REP)
+        admin = User(pk=2, role=User.Roles.ADMIN)
+        self.assertEqual(self.hits(rep, 'leads', 3), [True, True, False])
+        self.assertEqual(self.hits(admin, 'leads', 5), [True, True, True, True, False])
+
+    def test_rejected_requests_report_wait_and_do_not_count(self):
+        rep = User(pk=1, role=User.Roles.SALES_REP)
+        request = RequestFactory().get('/')
+        request.user = rep
+        view = SimpleNamespace(throttle_scope='leads')
+        throttle = RoleRateThrottle()
+        with mock.patch('crm_app.throttling.time.time', return_value=6000 + 59):
+            self.assertEqual(self.hits(rep, 'leads', 5), [True, True, False, False, False])
+            self.assertFalse(throttle.allow_request(request, view))
+            self.assertEqual(throttle.wait(), 1)
+        # Halfway through the next window the previous one weighs 2 * 0.5
+        with mock.patch('crm_app.throttling.time.time', return_value=6060 + 30):
+            self.assertEqual(self.hits(rep, 'leads', 2), [True, False])
+
+    def test_anonymous_clients_are_limited_per_ip_and_aliases_apply(self):
+        anonymous = AnonymousUser()
+        self.assertEqual(self.hits(anonymous, 'dj_rest_auth', 2), [True, False])
+        self.assertEqual(self.hits(anonymous, 'auth', 1), [False])
+        self.assertEqual(self.hits(anonymous, 'auth', 1, ip='10.0.0.2'), [True])
+
+    def test_unconfigured_scope_is_not_limited(self):
+        self.assertEqual(self.hits(AnonymousUser(), 'courses', 5), [True] * 5)
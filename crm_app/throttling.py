@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class RoleRateThrottle(BaseThrottle):
+    """
+    Sliding-window limit per (scope, user), with the scope taken from the
+    view's ``throttle_scope`` and its rate from DEFAULT_THROTTLE_RATES,
+    scaled by THROTTLE_ROLE_MULTIPLIERS for the user's role. Anonymous
+    clients are counted per IP.
+
+    State is two counters per client in the shared cache (this window and
+    the previous one, weighted by overlap), updated with add/incr so
+    concurrent workers don't lose hits. The throttle itself costs three
+    cache operations and no database access. DRF authenticates first,
+    though, so a rejected request is only database-free with a bearer
+    token whose revocation state is cached; session and DRF-token clients
+    still cost their authentication queries.
+    """
+    cache = cache
+    default_scope = 'default'
+
+    def get_scope(self, view):
+        scope = getattr(view, 'throttle_scope', None) or self.default_scope
+        return settings.THROTTLE_SCOPE_ALIASES.get(scope, scope)
+
+    def get_rate(self, request, scope):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return None, None
+        limit, window = SimpleRateThrottle.parse_rate(None, rate)
+        user = request.user
+        if user and user.is_authenticated:
+            limit = int(limit * settings.THROTTLE_ROLE_MULTIPLIERS.get(user.role, 1))
+        return limit, window
+
+    def get_ident_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        limit, window = self.get_rate(request, scope)
+        if limit is None:
+            return True
+
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        key = f'throttle:{scope}:{self.get_ident_key(request)}'
+        current_key, previous_key = f'{key}:{index}', f'{key}:{index - 1}'
+
+        self.cache.add(current_key, 0, window * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.set(current_key, 1, window * 2)
+            current = 1
+        previous = self.cache.get(previous_key, 0)
+        weight = 1 - elapsed / window
+        if previous * weight + current <= limit:
+            return True
+
+        # Rejected requests don't use up the budget
+        self.cache.decr(current_key)
+        room = limit - current
+        if room < 0 or not previous:
+            self.retry_after = window - elapsed
+        else:
+            self.retry_after = max(window * (1 - room / previous) - elapsed, 0)
+        return False
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
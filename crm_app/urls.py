@@ -1,7 +1,11 @@
 from django.urls import path
 from .views import *
+from .async_views import AsyncCourseListView, AsyncEnrollmentListView, AsyncLeadListView
 
 urlpatterns = [
+    path('auth/token/', TokenObtainView.as_view(), name='token-obtain'),
+    path('auth/token/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
+
     path('users/', UserListCreateView.as_view(), name='user-list-create'),
     path('users/<int:pk>/', UserRetrieveUpdateDestroyView.as_view(), name='user-detail-update-destroy'),
 
@@ -9,8 +13,36 @@ urlpatterns = [
     path('courses/<int:pk>/', CourseRetrieveUpdateDestroyView.as_view(), name='course-detail-update-destroy'),
 
     path('leads/', LeadListCreateView.as_view(), name = 'lead-list-create'),
+    path('leads/search/', LeadSearchView.as_view(), name='lead-search'),
+    path('leads/choices/', LeadChoicesView.as_view(), name='lead-choices'),
+    path('leads/import/', LeadImportView.as_view(), name='lead-import'),
+    path('leads/export/', LeadExportView.as_view(), name='lead-export'),
+    path('leads/bulk/', LeadBulkUpdateView.as_view(), name='lead-bulk-update'),
+    path('leads/sync/', LeadSyncView.as_view(), name='lead-sync'),
+    path('leads/call-queue/', CallQueueView.as_view(), name='lead-call-queue'),
     path('leads/<int:pk>/', LeadRetrieveUpdateDestroyView.as_view(), name='lead-retrieve-update-destroy'),
+    path('leads/<int:pk>/log-call/', LogCallView.as_view(), name='lead-log-call'),
+
+    path('analytics/leads/', LeadAnalyticsView.as_view(), name='lead-analytics'),
+    path('reports/revenue/', RevenueReportView.as_view(), name='revenue-report'),
 
     path('enrollments/', EnrollmentListView.as_view(), name='enrollment-list'),
+    path('enrollments/export/', EnrollmentExportView.as_view(), name='enrollment-export'),
+    path('enrollments/sync/', EnrollmentSyncView.as_view(), name='enrollment-sync'),
     path('enrollments/<int:pk>/', EnrollmentRetrieveUpdateDestroyView.as_view(), name='enrollments-update-retrieve-destroy'),
+    path('enrollments/<int:pk>/payments/', PaymentListCreateView.as_view(), name='enrollment-payment-list-create'),
+
+    path('webhooks/', WebhookListCreateView.as_view(), name='webhook-list-create'),
+    path('webhooks/<int:pk>/', WebhookRetrieveUpdateDestroyView.as_view(), name='webhook-retrieve-update-destroy'),
+
+    path('jobs/', JobListView.as_view(), name='job-list'),
+    path('jobs/<int:pk>/', JobRetrieveView.as_view(), name='job-detail'),
+    path('jobs/<int:pk>/download/', JobDownloadView.as_view(), name='job-download'),
+
+    path('payments/<int:pk>/', PaymentRetrieveUpdateDestroyView.as_view(), name='payment-retrieve-update-destroy'),
+
+    # Async ORM variants of the read-heavy lists, for ASGI deployments
+    path('async/leads/', AsyncLeadListView.as_view(), name='async-lead-list'),
+    path('async/enrollments/', AsyncEnrollmentListView.as_view(), name='async-enrollment-list'),
+    path('async/courses/', AsyncCourseListView.as_view(), name='async-course-list'),
 ]
\ No newline at end of file
@@ -1,78 +1,472 @@
-from rest_framework import generics, permissions, status
+import datetime
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.http import FileResponse
+from django.utils import timezone
+from rest_framework import filters, generics, permissions, status
+from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from .models import User, Course, Enrollment
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+from .models import User, Course, Enrollment, Payment, Job, Tombstone, Webhook
 from .serializers import *
 from .permissions import IsSuperadminOrAdmin
+from .pagination import KeysetPagination
+from .fastlist import FastListMixin
+from .conditional import ConditionalDetailMixin, ConditionalListMixin
+from .fieldsets import SparseFieldsetMixin
+from .filters import EnrollmentFilterBackend, LeadFilter, LeadFilterBackend
+from .jobs import enqueue
+from .outbox import record_leads_created, record_status_changes
+from .search import search_leads
+from .sync import changed_after, deleted_between, read_position, write_position
+from .importers import FORMATS, LeadImporter, guess_format
+from .services import bulk_update_leads, call_queue, convert_lead, log_call
+from .reports import month_start, revenue_report
+from .analytics import DIMENSIONS, PERIODS, lead_pipeline_report
+from .authentication import invalidate_user_state, issue_token
+from .caching import COURSE_LIST_KEY, build_entry, cached_entry, conditional_response, course_detail_key
+from .exporters import LEAD_EXPORT_COLUMNS, ENROLLMENT_EXPORT_COLUMNS, csv_export_response
+
+def wants_background(request):
+    # ?background=true: queue the work and answer 202 with the job (see JobRetrieveView)
+    return request.query_params.get('background') == 'true'
+
+
+def enqueued_response(request, task, payload, **kwargs):
+    job = enqueue(task, payload, user=request.user, **kwargs)
+    data = JobSerializer(job, context={'request': request}).data
+    return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
 
-class LeadListCreateView(generics.ListCreateAPIView):
+
+class LeadListCreateView(ConditionalListMixin, SparseFieldsetMixin, FastListMixin, generics.ListCreateAPIView):
     serializer_class = LeadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+    pagination_class = KeysetPagination
+    filter_backends = [LeadFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['created_at', 'add_date', 'last_call', 'next_call', 'student_name', 'status']
+    ordering = ['-created_at']
 
     def get_queryset(self):
         # Only show leads that are not converted
         return Lead.objects.exclude(status=Lead.StatusChoices.CONVERTED)
     
     def perform_create(self, serializer):
-        lead = serializer.save()
-        # If lead is created with Converted status, create enrollment
-        if lead.status == Lead.StatusChoices.CONVERTED:
-            if not Enrollment.objects.filter(lead=lead).exists():
-                Enrollment.objects.create(
-                    lead=lead,
-                    course=lead.course
-                )
+        with transaction.atomic():
+            lead = serializer.save()
+            # If lead is created with Converted status, create enrollment
+            if lead.status == Lead.StatusChoices.CONVERTED:
+                convert_lead(lead)
+            record_leads_created([lead])
 
 
-class LeadRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Lead.objects.all()
+class LeadSearchView(SparseFieldsetMixin, FastListMixin, generics.ListAPIView):
+    # GET /api/leads/search/?q=<name, email, city, remarks or phone prefix>&limit=20
     serializer_class = LeadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+    filter_backends = [LeadFilterBackend]
+    default_limit = 20
+    max_limit = 100
+
+    def get_queryset(self):
+        # Like the lead list: converted leads are looked up as enrollments
+        leads = Lead.objects.exclude(status=Lead.StatusChoices.CONVERTED)
+        return search_leads(leads, self.request.query_params.get('q', ''))
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        queryset = self.filter_queryset(self.get_queryset())[:max(limit, 1)]
+        return Response(self.get_rows(queryset))
+
+
+class LeadImportView(generics.GenericAPIView):
+    # POST /api/leads/import/ with a multipart "file" (.csv or .jsonl, or ?file_format=csv|jsonl)
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'bulk'
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV or JSONL file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        # Not ?format=, which DRF reserves for renderer selection
+        fmt = request.query_params.get('file_format') or guess_format(upload.name)
+        if fmt not in FORMATS:
+            return Response({'error': 'Format must be one of: csv, jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if wants_background(request):
+            path = default_storage.save(f'imports/{uuid.uuid4().hex}/{upload.name}', upload)
+            # Not retried: a failed import may already have written some batches
+            return enqueued_response(request, 'import_leads', {'file': path, 'format': fmt}, max_attempts=1)
+
+        report = LeadImporter(user=request.user).run(upload, fmt)
+        return Response(report, status=status.HTTP_200_OK)
+
 
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        prev_status = instance.status
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+class LeadExportView(LeadListCreateView):
+    # GET /api/leads/export/ streams the filtered lead list as CSV
+    http_method_names = ['get', 'head', 'options']
+    throttle_scope = 'export'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if wants_background(request):
+            return enqueued_response(request, 'export_leads', {'query': dict(request.query_params.lists())})
+        return csv_export_response(queryset, LEAD_EXPORT_COLUMNS, 'leads')
+
+
+class LeadBulkUpdateView(generics.GenericAPIView):
+    # PATCH /api/leads/bulk/ {"ids": [...] or "filter": {...list filters...}, "update": {...}}
+    serializer_class = LeadBulkUpdateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'bulk'
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        updated_lead = serializer.save()
-
-        if prev_status != Lead.StatusChoices.CONVERTED and updated_lead.status == Lead.StatusChoices.CONVERTED:
-            if not Enrollment.objects.filter(lead=updated_lead).exists():
-                Enrollment.objects.create(
-                    lead=updated_lead,
-                    course=updated_lead.course
-                )
+        if wants_background(request):
+            # The task validates the raw data again when it runs
+            return enqueued_response(request, 'bulk_update_leads', request.data)
+        data = serializer.validated_data
+        return Response({'updated': bulk_update_leads(data, data['update'])})
+
+
+class SyncView(FastListMixin, generics.GenericAPIView):
+    """
+    Changes since a point in time: GET ?since=<ISO datetime> (or nothing, for
+    everything), then ?cursor= from each response until has_more is false;
+    keep the last cursor for the next sync. A page is one range scan on
+    (updated_at, id) plus the tombstones of rows deleted in the same span.
+
+    Changes younger than SYNC_SETTLE_SECONDS wait for the next sync, so rows
+    from transactions still committing (or not yet on the replica) aren't
+    skipped over.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    page_size_query_param = 'page_size'
+    tombstone_kind = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.SYNC_PAGE_SIZE
+        return min(size, settings.SYNC_PAGE_SIZE) if size > 0 else settings.SYNC_PAGE_SIZE
+
+    def get(self, request, *args, **kwargs):
+        until = timezone.now() - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        position = read_position(request.query_params)
+        size = self.get_page_size(request)
+        queryset = changed_after(self.get_queryset(), position, until)
+
+        builder = self.get_row_builder()
+        if builder is not None:
+            rows = list(builder.values(queryset, 'updated_at')[:size + 1])
+            key = lambda row: (row['updated_at'], row['id'])
+        else:
+            rows = list(queryset[:size + 1])
+            key = lambda row: (row.updated_at, row.pk)
+        has_more = len(rows) > size
+        rows = rows[:size]
+
+        # Deletions are reported for the same span of time as the changed rows
+        if has_more:
+            end = key(rows[-1])
+        else:
+            end = max(key(rows[-1]), (until, 0)) if rows else (until, 0)
+        deleted = deleted_between(self.tombstone_kind, position, end[0])
+        changed = builder.build(rows) if builder is not None else self.get_serializer(rows, many=True).data
+
+        cursor = write_position(*end)
+        next_url = None
+        if has_more:
+            next_url = replace_query_param(
+                remove_query_param(request.build_absolute_uri(), 'since'), 'cursor', cursor,
+            )
+        return Response({
+            'changed': changed, 'deleted': deleted, 'cursor': cursor, 'has_more': has_more, 'next': next_url,
+        })
+
+
+class LeadSyncView(SyncView):
+    # GET /api/leads/sync/ - every lead, converted ones included
+    queryset = Lead.objects.all()
+    serializer_class = LeadSerializer
+    throttle_scope = 'leads'
+    tombstone_kind = Tombstone.Kinds.LEAD
+
+
+class LeadRetrieveUpdateDestroyView(ConditionalDetailMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Lead.objects.all()
+    serializer_class = LeadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+
+    def perform_update(self, serializer):
+        prev_status = serializer.instance.status
+        with transaction.atomic():
+            updated_lead = serializer.save()
+
+            if prev_status != Lead.StatusChoices.CONVERTED and updated_lead.status == Lead.StatusChoices.CONVERTED:
+                convert_lead(updated_lead)
+            record_status_changes([updated_lead], {updated_lead.pk: prev_status})
+
+
+class CallQueueView(generics.ListAPIView):
+    # GET /api/leads/call-queue/?date=2025-01-31&limit=50 - the signed-in rep's due and overdue calls
+    serializer_class = CallQueueSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+    default_limit = 50
+    max_limit = 200
+
+    def get_day(self):
+        value = self.request.query_params.get('date')
+        if not value:
+            return timezone.localdate()
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({'date': 'Enter a date in YYYY-MM-DD format.'})
+
+    def get_queryset(self):
+        return call_queue(self.request.user.pk, self.get_day())
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        queryset = self.get_queryset()[:max(limit, 1)]
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
+class LogCallView(generics.GenericAPIView):
+    # POST /api/leads/<pk>/log-call/ {"next_call": "2025-02-03" or null, "remarks": "optional call notes"}
+    serializer_class = LogCallSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+
+    def post(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        serializer = self.get_serializer(data=request.data, context={'today': today})
+        serializer.is_valid(raise_exception=True)
+        if not log_call(kwargs['pk'], today, **serializer.validated_data):
+            return Response({'error': 'Lead not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        following = call_queue(request.user.pk, today).exclude(pk=kwargs['pk']).first()
+        return Response({
+            'lead': {'id': kwargs['pk'], 'last_call': today, **serializer.validated_data},
+            'next': CallQueueSerializer(following).data if following else None,
+        })
+
+
+class LeadChoicesView(APIView):
+    # Choice enums for the lead form; they only change with a deploy.
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'leads'
+    entry = build_entry({
+        name: [{'value': value, 'label': label} for value, label in choices.choices]
+        for name, choices in LeadFilter.choice_fields.items()
+    })
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(request, self.entry)
+
+
+class LeadAnalyticsView(APIView):
+    # GET /api/analytics/leads/?period=day|week|month&group_by=status,source&start=2025-01-01&end=2025-01-31
+    permission_classes = [IsSuperadminOrAdmin]
+    throttle_scope = 'reports'
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        errors = {}
+        period = params.get('period', 'day')
+        if period not in PERIODS:
+            errors['period'] = f"Choose one of: {', '.join(PERIODS)}."
+        group_by = [name for name in params.get('group_by', '').split(',') if name]
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            errors['group_by'] = f"Unknown dimension(s): {', '.join(unknown)}."
+        dates = {}
+        for name in ['start', 'end']:
+            try:
+                dates[name] = datetime.date.fromisoformat(params[name]) if params.get(name) else None
+            except ValueError:
+                errors[name] = 'Enter a date in YYYY-MM-DD format.'
+        if errors:
+            raise ValidationError(errors)
+
+        return Response(list(lead_pipeline_report(period, group_by, **dates)))
+
+
+class RevenueReportView(APIView):
+    # GET /api/reports/revenue/?start=2025-01&end=2025-06 (defaults to the last 12 months)
+    permission_classes = [IsSuperadminOrAdmin]
+    throttle_scope = 'reports'
+    max_months = 36
+
+    def parse_month(self, value, errors, name):
+        try:
+            return datetime.datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            errors[name] = 'Enter a month in YYYY-MM format.'
+
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        end = month_start(today)
+        start = datetime.date(end.year - 1, end.month, 1)
+        errors = {}
+        if request.query_params.get('start'):
+            start = self.parse_month(request.query_params['start'], errors, 'start')
+        if request.query_params.get('end'):
+            end = self.parse_month(request.query_params['end'], errors, 'end')
+        if not errors and (start > end or (end.year - start.year) * 12 + end.month - start.month >= self.max_months):
+            errors['start'] = f'Choose a range of 1 to {self.max_months} months.'
+        if errors:
+            raise ValidationError(errors)
+
+        if wants_background(request):
+            return enqueued_response(request, 'revenue_report', {'start': start, 'end': end})
+        return Response(revenue_report(start, end))
+
+
 class CourseListCreateView(generics.ListCreateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsSuperadminOrAdmin]
 
+    def list(self, request, *args, **kwargs):
+        entry = cached_entry(
+            COURSE_LIST_KEY,
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+            settings.COURSE_CACHE_TTL,
+        )
+        return conditional_response(request, entry)
+
     
 class CourseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsSuperadminOrAdmin]
 
+    def retrieve(self, request, *args, **kwargs):
+        entry = cached_entry(
+            course_detail_key(kwargs['pk']),
+            lambda: dict(self.get_serializer(self.get_object()).data),
+            settings.COURSE_CACHE_TTL,
+        )
+        return conditional_response(request, entry)
 
-class EnrollmentListView(generics.ListAPIView):
-    queryset = Enrollment.objects.all()
+
+class EnrollmentListView(ConditionalListMixin, FastListMixin, generics.ListAPIView):
+    queryset = Enrollment.objects.for_display()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'enrollments'
+    pagination_class = KeysetPagination
+    filter_backends = [EnrollmentFilterBackend]
+
+
+class EnrollmentExportView(EnrollmentListView):
+    # GET /api/enrollments/export/ streams enrollments with their balances as CSV
+    throttle_scope = 'export'
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if wants_background(request):
+            return enqueued_response(request, 'export_enrollments', {'query': dict(request.query_params.lists())})
+        return csv_export_response(queryset, ENROLLMENT_EXPORT_COLUMNS, 'enrollments')
 
-class EnrollmentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Enrollment.objects.all()
+
+class EnrollmentSyncView(SyncView):
+    # GET /api/enrollments/sync/
+    queryset = Enrollment.objects.for_display()
+    serializer_class = EnrollmentSerializer
+    throttle_scope = 'enrollments'
+    tombstone_kind = Tombstone.Kinds.ENROLLMENT
+
+
+class EnrollmentRetrieveUpdateDestroyView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Enrollment.objects.for_display()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'enrollments'
+    # The student and parent columns come from the lead
+    last_modified_fields = ['updated_at', 'lead__updated_at']
+
+
+class PaymentListCreateView(generics.ListCreateAPIView):
+    # GET/POST /api/enrollments/<pk>/payments/
+    serializer_class = PaymentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'enrollments'
+
+    def get_enrollment(self):
+        return generics.get_object_or_404(Enrollment.objects.only('id'), pk=self.kwargs['pk'])
+
+    def get_queryset(self):
+        return Payment.objects.filter(enrollment_id=self.kwargs['pk']).order_by('paid_on', 'id')
+
+    def list(self, request, *args, **kwargs):
+        self.get_enrollment()
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(enrollment=self.get_enrollment())
+
+
+class PaymentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Payment.objects.all()
+    serializer_class = PaymentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'enrollments'
+
+
+class TokenObtainView(APIView):
+    # POST /api/auth/token/ {"username", "password"} -> signed access token for "Authorization: Bearer"
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'auth'
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        serializer = AuthTokenSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token, expires = issue_token(serializer.validated_data['user'])
+        return Response({'access': token, 'token_type': 'Bearer', 'expires_at': expires})
+
+
+class TokenRevokeView(APIView):
+    # POST /api/auth/token/revoke/ invalidates every token issued to the current user
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'auth'
+
+    def post(self, request, *args, **kwargs):
+        User.objects.filter(pk=request.user.pk).update(token_version=F('token_version') + 1)
+        invalidate_user_state(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UserListCreateView(generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegisterSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'users'
 
     def create(self, request, *args, **kwargs):
         current_user = request.user
@@ -100,6 +494,7 @@ class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegisterSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'users'
 
     def get_object(self):
         obj = super().get_object()
@@ -116,4 +511,57 @@ class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         # Sales rep cannot edit/delete any user
         else:
             raise permissions.PermissionDenied("Sales rep cannot manage users.")
-        return obj  
\ No newline at end of file
+        return obj  
+
+
+class WebhookListCreateView(generics.ListCreateAPIView):
+    # POST /api/webhooks/ {"url": ..., "events": ["lead.created", ...]} - lead lifecycle events are pushed there
+    queryset = Webhook.objects.order_by('id')
+    serializer_class = WebhookSerializer
+    permission_classes = [IsSuperadminOrAdmin]
+
+    def perform_create(self, serializer):
+        serializer.save(created_by_id=self.request.user.pk)
+
+
+class WebhookRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Webhook.objects.all()
+    serializer_class = WebhookSerializer
+    permission_classes = [IsSuperadminOrAdmin]
+
+
+class JobMixin:
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Admins see every job, everyone else their own
+        queryset = Job.objects.all()
+        if self.request.user.role not in [User.Roles.SUPERADMIN, User.Roles.ADMIN]:
+            queryset = queryset.filter(created_by_id=self.request.user.pk)
+        return queryset
+
+
+class JobListView(JobMixin, generics.ListAPIView):
+    # GET /api/jobs/?status=queued|running|succeeded|failed, newest first
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset().order_by('-created_at', '-id')
+        if self.request.query_params.get('status'):
+            queryset = queryset.filter(status=self.request.query_params['status'])
+        return queryset
+
+
+class JobRetrieveView(JobMixin, generics.RetrieveAPIView):
+    pass
+
+
+class JobDownloadView(JobMixin, generics.GenericAPIView):
+    # GET /api/jobs/<pk>/download/ - the file an export job wrote
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        path = (job.result or {}).get('file') if job.status == Job.StatusChoices.SUCCEEDED else None
+        if not path:
+            raise NotFound('This job has no file to download.')
+        return FileResponse(default_storage.open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import OutboxEvent, Webhook, WebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-CRM-Signature'
+PENDING = WebhookDelivery.StatusChoices.PENDING
+
+
+def fan_out(limit):
+    """Queue a delivery of up to ``limit`` new outbox events to each webhook subscribed to them."""
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.filter(dispatched_at__isnull=True)
+            .order_by('id').select_for_update(skip_locked=True)[:limit]
+        )
+        if not events:
+            return 0
+        webhooks = list(Webhook.objects.filter(is_active=True).only('id', 'events'))
+        WebhookDelivery.objects.bulk_create(
+            [
+                WebhookDelivery(webhook=webhook, event=event)
+                for event in events for webhook in webhooks
+                if not webhook.events or event.event_type in webhook.events
+            ],
+            ignore_conflicts=True,
+        )
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(dispatched_at=timezone.now())
+    return len(events)
+
+
+def is_due(now):
+    return Q(is_active=True) & (Q(retry_after__isnull=True) | Q(retry_after__lte=now))
+
+
+def claim(webhook_id, now):
+    # A conditional UPDATE, so two dispatchers never send the same webhook's batch
+    lease = now + datetime.timedelta(seconds=settings.WEBHOOK_TIMEOUT * 2)
+    return Webhook.objects.filter(is_due(now), pk=webhook_id).update(retry_after=lease) == 1
+
+
+def sign(secret, body):
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def send(webhook, body):
+    response = requests.post(
+        webhook.url, data=body, timeout=settings.WEBHOOK_TIMEOUT,
+        headers={'Content-Type': 'application/json', SIGNATURE_HEADER: f'sha256={sign(webhook.secret, body)}'},
+    )
+    response.raise_for_status()
+
+
+def deliver(webhook, limit):
+    """
+    POST the webhook's oldest pending deliveries as one {"events": [...]}
+    body. On failure the whole webhook backs off (WEBHOOK_RETRY_DELAY,
+    doubling), so events still arrive in order; a delivery is given up
+    after WEBHOOK_MAX_ATTEMPTS.
+    """
+    deliveries = list(webhook.deliveries.filter(status=PENDING).select_related('event').order_by('id')[:limit])
+    if not deliveries:
+        Webhook.objects.filter(pk=webhook.pk).update(retry_after=None)
+        return 0
+    ids = [delivery.pk for delivery in deliveries]
+    body = json.dumps({'events': [
+        {
+            'id': delivery.event.pk,
+            'type': delivery.event.event_type,
+            'created_at': delivery.event.created_at,
+            'data': delivery.event.payload,
+        }
+        for delivery in deliveries
+    ]}, cls=DjangoJSONEncoder).encode()
+
+    now = timezone.now()
+    try:
+        send(webhook, body)
+    except requests.RequestException as exc:
+        logger.warning('Webhook %s failed: %s', webhook.pk, exc)
+        failures = webhook.failures + 1
+        delay = min(settings.WEBHOOK_RETRY_DELAY * 2 ** (failures - 1), settings.WEBHOOK_MAX_RETRY_DELAY)
+        with transaction.atomic():
+            pending = WebhookDelivery.objects.filter(pk__in=ids)
+            pending.update(attempts=F('attempts') + 1, last_error=str(exc)[:1000])
+            pending.filter(attempts__gte=settings.WEBHOOK_MAX_ATTEMPTS).update(
+                status=WebhookDelivery.StatusChoices.FAILED,
+            )
+            Webhook.objects.filter(pk=webhook.pk).update(
+                failures=failures, retry_after=now + datetime.timedelta(seconds=delay),
+            )
+        return 0
+
+    with transaction.atomic():
+        WebhookDelivery.objects.filter(pk__in=ids).update(
+            status=WebhookDelivery.StatusChoices.DELIVERED, attempts=F('attempts') + 1,
+            delivered_at=now, last_error='',
+        )
+        Webhook.objects.filter(pk=webhook.pk).update(failures=0, retry_after=None)
+    return len(ids)
+
+
+def dispatch(batch_size=None):
+    """One dispatcher pass: fan out new events, then send a batch to every due webhook. Returns (events, delivered)."""
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    events = fan_out(batch_size)
+    now = timezone.now()
+    pending = WebhookDelivery.objects.filter(webhook=OuterRef('pk'), status=PENDING)
+    due = Webhook.objects.filter(is_due(now), Exists(pending)).values_list('id', flat=True)
+    delivered = 0
+    for webhook_id in list(due):
+        if claim(webhook_id, now):
+            delivered += deliver(Webhook.objects.get(pk=webhook_id), batch_size)
+    return events, delivered
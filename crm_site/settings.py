@@ -13,7 +13,7 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv('ALLOWED_HOSTS', '').split(',') if host]
 
 # Application definition
 
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'crm_app',
     'rest_framework',
     'rest_framework.authtoken', 
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'crm_app.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,6 +68,9 @@ WSGI_APPLICATION = 'crm_site.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# How gunicorn.conf.py serves the app: 'wsgi' (default, threaded workers) or 'asgi'
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -74,12 +79,55 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Keep connections open between requests (seconds; 0 closes after each request)
+        # and check them before reuse so a restarted database doesn't surface as errors.
+        # Off by default under ASGI: sync database code runs in a thread per request
+        # there, so a persistent connection is never reused and outlives its thread.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0 if SERVER_MODE == 'asgi' else 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Required behind PgBouncer in transaction mode (exports use server-side cursors otherwise)
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
     }
 }
 
+# Django's native connection pool, replacing CONN_MAX_AGE. It needs psycopg 3:
+# swap psycopg2 in requirements.txt for "psycopg[binary,pool]" before setting
+# DB_POOL=True. docker-compose.yml pools with PgBouncer instead, which works
+# with psycopg2 and in both server modes.
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2:5433 (same name and credentials as
+# the primary). Safe requests read from them, see crm_app/db_router.py. In tests
+# they mirror the default database.
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica_host.strip().partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['crm_app.db_router.ReplicaRouter']
+# How long a client that wrote keeps reading from the primary
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 15))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'crm_app.authentication.JWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
@@ -87,10 +135,95 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'crm_app.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    # Sliding-window limits per endpoint group, counted in the shared cache (see crm_app/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'crm_app.throttling.RoleRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'default': os.getenv('THROTTLE_RATE_DEFAULT', '300/min'),
+        'leads': os.getenv('THROTTLE_RATE_LEADS', '300/min'),
+        'enrollments': os.getenv('THROTTLE_RATE_ENROLLMENTS', '300/min'),
+        'users': os.getenv('THROTTLE_RATE_USERS', '60/min'),
+        'auth': os.getenv('THROTTLE_RATE_AUTH', '20/min'),
+        'reports': os.getenv('THROTTLE_RATE_REPORTS', '30/min'),
+        'bulk': os.getenv('THROTTLE_RATE_BULK', '10/min'),
+        'export': os.getenv('THROTTLE_RATE_EXPORT', '5/min'),
+    },
+}
+
+# Multiplies the throttle rates above for authenticated users of each role
+THROTTLE_ROLE_MULTIPLIERS = {
+    'sales_rep': float(os.getenv('THROTTLE_MULTIPLIER_SALES_REP', 1)),
+    'admin': float(os.getenv('THROTTLE_MULTIPLIER_ADMIN', 2)),
+    'superadmin': float(os.getenv('THROTTLE_MULTIPLIER_SUPERADMIN', 4)),
 }
+# dj_rest_auth's login/password views share the auth budget
+THROTTLE_SCOPE_ALIASES = {'dj_rest_auth': 'auth'}
+
+# Keyset pagination for the lead and enrollment lists (see crm_app/pagination.py)
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 50))
+LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 500))
+# Build list responses from .values() rows instead of serializer instances (see crm_app/fastlist.py)
+FAST_LIST_RENDERING = os.getenv('FAST_LIST_RENDERING', 'True') == 'True'
+
+# Cache: Redis when REDIS_URL is set, otherwise a per-process local memory cache.
+# Cache invalidation (courses, revenue report, token revocation) and throttle
+# counters only reach the process that made the change, so REDIS_URL is required
+# whenever more than one process serves requests or runs jobs (gunicorn.conf.py
+# refuses to start several workers without it).
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+COURSE_CACHE_TTL = int(os.getenv('COURSE_CACHE_TTL', 3600))
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', 86400))
+
+# Signed access tokens (POST /api/auth/token/). Revocation checks are cached
+# per user for JWT_REVOCATION_CACHE_TTL seconds.
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY') or SECRET_KEY
+JWT_ACCESS_TTL = int(os.getenv('JWT_ACCESS_TTL', 3600))
+JWT_REVOCATION_CACHE_TTL = int(os.getenv('JWT_REVOCATION_CACHE_TTL', 60))
+
+# An unpaid enrollment is overdue when nothing has been paid for this many days
+PAYMENT_OVERDUE_DAYS = int(os.getenv('PAYMENT_OVERDUE_DAYS', 30))
+
+# Incremental sync (GET /api/leads/sync/, /api/enrollments/sync/): rows per page,
+# how long a change settles before it is served, and how long deletions are kept
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', 5))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 90))
+
+# Background jobs (?background=true on imports, exports, bulk updates and reports),
+# run by `manage.py run_jobs`. Failed jobs are retried after JOB_RETRY_DELAY seconds,
+# doubling each time; running jobs older than JOB_TIMEOUT count as failed.
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 30))
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', 3600))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 1))
+
+# Lead lifecycle webhooks, sent by `manage.py dispatch_webhooks`: events per request,
+# request timeout, and backoff after a failure (doubling up to the maximum). A
+# delivery is given up after WEBHOOK_MAX_ATTEMPTS.
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 100))
+WEBHOOK_TIMEOUT = int(os.getenv('WEBHOOK_TIMEOUT', 10))
+WEBHOOK_RETRY_DELAY = int(os.getenv('WEBHOOK_RETRY_DELAY', 30))
+WEBHOOK_MAX_RETRY_DELAY = int(os.getenv('WEBHOOK_MAX_RETRY_DELAY', 3600))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 10))
+WEBHOOK_POLL_SECONDS = float(os.getenv('WEBHOOK_POLL_SECONDS', 1))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,46 @@
+# Production server: gunicorn -c gunicorn.conf.py
+#
+# SERVER_MODE=wsgi (default) runs crm_site.wsgi with threaded sync workers.
+# SERVER_MODE=asgi runs crm_site.asgi under uvicorn workers, so the /api/async/
+# views can wait on the database without holding a thread. Opt in only for a
+# deployment that serves those: under ASGI every sync view shares one executor
+# thread per worker, and streamed CSV exports and job downloads are built in
+# memory before they are sent.
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+CPUS = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'crm_site.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Each event loop serves many connections; one per core is enough.
+    workers = int(os.getenv('WEB_CONCURRENCY', CPUS + 1))
+else:
+    wsgi_app = 'crm_site.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.getenv('WEB_CONCURRENCY', CPUS * 2 + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Without Redis every worker has its own cache: a course saved in one worker
+# stays stale in the others for COURSE_CACHE_TTL, and throttle counters are
+# per worker. Refuse to start that way unless there is only one worker.
+if workers > 1 and not os.getenv('REDIS_URL'):
+    raise RuntimeError(
+        f'REDIS_URL must be set when running {workers} workers; the local memory cache is per process. '
+        'Set WEB_CONCURRENCY=1 to run without Redis.'
+    )
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'